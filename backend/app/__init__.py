@@ -5,7 +5,9 @@ from flask_cors import CORS
 from flask_caching import Cache
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from flask.json.provider import DefaultJSONProvider
 import logging
+import orjson
 import subprocess
 
 # Add parent directory to path
@@ -26,6 +28,17 @@ limiter = Limiter(
 )
 
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, so every jsonify() serializes rows of
+    dicts in C instead of through the stdlib encoder"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 def setup_logging(app):
     """Configure application logging"""
     log_level = logging.DEBUG if app.config.get('DEBUG') else logging.INFO
@@ -51,6 +64,7 @@ def create_app(config=None):
     flask_config = get_config()
     app = Flask(__name__,
                 instance_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance'))
+    app.json = OrjsonProvider(app)
     
     # Apply configuration
     app.config.from_object(flask_config)
@@ -88,6 +102,13 @@ def create_app(config=None):
     # Initialize rate limiter with app instance
     limiter.init_app(app)
 
+    # Commit/rollback and return the request's pooled DB connection
+    from .database import db_manager
+
+    @app.teardown_appcontext
+    def release_db_connection(exception=None):
+        db_manager.release_connection(exception)
+
     # Register API Blueprints with versioning
     from .auth.controller import auth_bp
     from .college.controller import college_bp
@@ -151,6 +172,13 @@ def create_app(config=None):
         # For all other routes, serve index.html (SPA routing)
         return send_from_directory(frontend_dist, 'index.html')
 
+    # Werkzeug rejects bodies over MAX_CONTENT_LENGTH before the view runs
+    too_large_message = f"File too large. Maximum size is {app.config['MAX_PHOTO_SIZE_MB']}MB"
+
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return {"error": too_large_message}, 413
+
     # Handle 404 errors by serving the SPA
     @app.errorhandler(404)
     def page_not_found(error):
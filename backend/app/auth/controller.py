@@ -4,13 +4,15 @@ import logging
 import re
 
 from .models import User
+from ..database import commit, rollback
 from ..college.models import College
 from ..program.models import Program
 from ..student.models import Student
 from ..cache import (
     get_cached_dashboard_stats,
     get_cached_dashboard_program_charts,
-    get_cached_dashboard_college_charts
+    get_cached_dashboard_college_charts,
+    get_cached_user_summary
 )
 
 # Configure logging
@@ -151,18 +153,15 @@ def status():
         if 'user_id' not in session:
             return jsonify({'isAuthenticated': False}), 200
 
-        user = User.get_by_id(session['user_id'])
+        # Polled on every page load, so the user's public fields are cached briefly
+        user = get_cached_user_summary(session['user_id'])
         if not user:
             session.clear()
             return jsonify({'isAuthenticated': False}), 200
 
         return jsonify({
             'isAuthenticated': True,
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email']
-            }
+            'user': user
         }), 200
     except Exception as e:
         logger.error(f"Status check error: {str(e)}", exc_info=True)
@@ -206,6 +205,7 @@ def signup():
         if not new_user:
             logger.error(f"Failed to create user: {username}")
             return jsonify({'error': 'Failed to create user'}), 500
+        commit()
 
         logger.info(f"New user created: {username}")
 
@@ -219,6 +219,7 @@ def signup():
         }), 201
 
     except Exception as e:
+        rollback()
         logger.error(f"Signup error: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred during signup'}), 500
 
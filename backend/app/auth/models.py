@@ -1,5 +1,27 @@
 from werkzeug.security import generate_password_hash, check_password_hash
-from ..database import get_one, insert_record, update_record, delete_record, execute_raw_sql
+from ..database import insert_record, update_record, delete_record, execute_raw_sql
+
+# Account lookups run on every login, registration check and auth status
+# miss, so their SQL is built once rather than per call
+USER_BY_USERNAME_QUERY = 'SELECT * FROM "user" WHERE username = %s'
+USER_BY_EMAIL_QUERY = 'SELECT * FROM "user" WHERE email = %s'
+USER_BY_ID_QUERY = 'SELECT * FROM "user" WHERE id = %s'
+
+
+def run_off_hub(func, *args):
+    """
+    Run CPU-bound work (password hashing) on a native thread under gevent workers,
+    so the worker's other greenlets keep being served; a plain call otherwise
+    """
+    try:
+        from gevent import get_hub
+        from gevent.monkey import is_module_patched
+    except ImportError:
+        return func(*args)
+    if not is_module_patched('threading'):
+        return func(*args)
+    return get_hub().threadpool.apply(func, args)
+
 
 class User:
     """User model for authentication using Supabase"""
@@ -19,22 +41,28 @@ class User:
     @staticmethod
     def get_by_username(username):
         # Get user by username
-        return get_one('"user"', where_clause="username = %s", params=[username])
+        return User._fetch_one(USER_BY_USERNAME_QUERY, username)
 
     @staticmethod
     def get_by_email(email):
         # Get user by email
-        return get_one('"user"', where_clause="email = %s", params=[email])
+        return User._fetch_one(USER_BY_EMAIL_QUERY, email)
 
     @staticmethod
     def get_by_id(user_id):
-        return get_one('"user"', where_clause="id = %s", params=[user_id])
+        return User._fetch_one(USER_BY_ID_QUERY, user_id)
+
+    @staticmethod
+    def _fetch_one(query, value):
+        result = execute_raw_sql(query, params=[value], fetch=True)
+        return result[0] if result else None
 
     @staticmethod
     def create_user(username, email, password):
-        password_hash = generate_password_hash(password)
+        password_hash = run_off_hub(generate_password_hash, password)
         query = 'INSERT INTO "user" (username, email, password_hash) VALUES (%s, %s, %s) RETURNING *'
-        return execute_raw_sql(query, params=[username, email, password_hash], fetch=True)
+        result = execute_raw_sql(query, params=[username, email, password_hash], fetch=True)
+        return result[0] if result else None
 
     @staticmethod
     def update_user(user_id, username=None, email=None, password=None):
@@ -44,15 +72,25 @@ class User:
         if email:
             update_data['email'] = email
         if password:
-            update_data['password_hash'] = generate_password_hash(password)
+            update_data['password_hash'] = run_off_hub(generate_password_hash, password)
         if not update_data:
             return None
-        return update_record('"user"', update_data, "id = %s", params={**update_data, 'id': user_id})
+        result = update_record('"user"', update_data, "id = %s", params={**update_data, 'id': user_id})
+        User._forget_cached(user_id)
+        return result
 
     @staticmethod
     def delete_user(user_id):
-        return delete_record('"user"', "id = %s", params=[user_id])
+        result = delete_record('"user"', "id = %s", params=[user_id])
+        User._forget_cached(user_id)
+        return result
+
+    @staticmethod
+    def _forget_cached(user_id):
+        # Imported here: app.cache needs the app's cache, which exists only after create_app
+        from ..cache import clear_user_summary
+        clear_user_summary(user_id)
 
     @staticmethod
     def verify_password(password_hash, password):
-        return check_password_hash(password_hash, password)
+        return run_off_hub(check_password_hash, password_hash, password)
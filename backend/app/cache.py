@@ -1,7 +1,11 @@
 
 
+import logging
+
 from . import cache
 
+logger = logging.getLogger(__name__)
+
 
 def get_cached_dashboard_stats():
     """Get cached dashboard statistics or calculate and cache them"""
@@ -12,15 +16,15 @@ def get_cached_dashboard_stats():
         return cached_data
 
     # Cache miss - calculate from database
-    from .auth.models import User
-    from .student.models import Student
-    from .program.models import Program
-    from .college.models import College
+    from .database import count_records, savepoint
 
     try:
-        total_students = Student.count_students()
-        total_programs = len(Program.get_all_programs())
-        total_colleges = len(College.get_all_colleges())
+        # Reuse the cached stats aggregate rather than running a separate COUNT(*)
+        total_students = get_cached_student_stats().get('total', 0)
+        # COUNT(*) instead of fetching every row just to measure the list
+        with savepoint():
+            total_programs = count_records("program")
+            total_colleges = count_records("college")
 
         stats = {
             "total_students": total_students,
@@ -103,17 +107,71 @@ def get_cached_dashboard_college_charts():
         return []
 
 
+def get_cached_student_stats():
+    """Get cached student statistics (total, by year, by course) or calculate and cache them"""
+    cache_key = 'student_stats'
+    cached_data = cache.get(cache_key)
+
+    if cached_data is not None:
+        return cached_data
+
+    # Cache miss - aggregate from the Student model
+    from .student.models import Student
+
+    stats = Student.get_student_stats()
+
+    # An empty result may be the model's error fallback, so don't pin it
+    if stats.get('total'):
+        cache.set(cache_key, stats, timeout=60)  # 1 minute
+    return stats
+
+
 def clear_dashboard_cache():
     """Clear all dashboard-related cache entries (call after CRUD operations)"""
     try:
         cache.delete('dashboard_stats')
         cache.delete('dashboard_program_charts')
         cache.delete('dashboard_college_charts')
+        cache.delete('student_stats')
         print("✅ Dashboard cache cleared")
     except Exception as e:
         print(f"Error clearing dashboard cache: {e}")
 
 
+# ============================================
+# AUTH STATUS CACHE
+# ============================================
+USER_SUMMARY_TIMEOUT = 30  # seconds
+
+
+def get_cached_user_summary(user_id):
+    """Get a user's public fields (id, username, email) for session checks, or None if the user is gone"""
+    cache_key = f"user_summary:{user_id}"
+    cached_data = cache.get(cache_key)
+
+    if cached_data is not None:
+        return cached_data
+
+    # Cache miss - load from the User model (the password hash is never cached)
+    from .auth.models import User
+
+    user = User.get_by_id(user_id)
+    if not user:
+        return None
+
+    summary = {'id': user['id'], 'username': user['username'], 'email': user['email']}
+    cache.set(cache_key, summary, timeout=USER_SUMMARY_TIMEOUT)
+    return summary
+
+
+def clear_user_summary(user_id):
+    """Drop a user's cached summary (call after the user is updated or deleted)"""
+    try:
+        cache.delete(f"user_summary:{user_id}")
+    except Exception as e:
+        logger.warning(f"Error clearing user summary cache: {e}")
+
+
 def get_cache_info():
     """Get information about current cache status"""
     return {
@@ -1,14 +1,28 @@
 from flask import Blueprint, request, jsonify
 from .models import College
-from ..student.models import Student
 from ..program.models import Program
+from ..utils import conditional_jsonify
+from ..database import commit, rollback
 from ..cache import clear_dashboard_cache
-from ..supabase import get_all, get_one, insert_record, update_record, delete_record, count_records, execute_raw_sql, paginate_query, supabase_manager
+from operator import itemgetter
 import re
 
 
 college_bp = Blueprint("college", __name__, url_prefix="/api/colleges")
 
+# College fields matched by each ?filter= value of the list search
+SEARCH_FIELDS = {
+    "all": ('code', 'name'),
+    "code": ('code',),
+    "name": ('name',),
+}
+
+# Sort key for each ?sort= value of the list endpoint
+SORT_KEYS = {
+    "code": itemgetter('code'),
+    "name": itemgetter('name'),
+}
+
 def validate_college_data(data, college_code=None, is_update=False):
     """Validate college data"""
     errors = []
@@ -29,7 +43,8 @@ def validate_college_data(data, college_code=None, is_update=False):
         if not re.match(r"^[A-Z0-9\-]{2,10}$", code):
             errors.append("College code must be 2-10 characters, letters, numbers, and hyphens only")
 
-        existing = College.get_by_code(code)
+        # An update keeping its own code can't conflict with itself
+        existing = None if is_update and code == college_code else College.get_by_code(code)
         if existing:
             
             if is_update and college_code and existing["code"] != college_code:
@@ -62,21 +77,26 @@ def get_colleges():
         colleges = College.get_all_colleges()
         
         # Apply search filter (null-safe)
-        if search:
+        search_columns = SEARCH_FIELDS.get(filter_field)
+        if search and search_columns:
             search_term = search.lower()
-            if filter_field == "all":
-                colleges = [c for c in colleges if search_term in (c.get('code') or '').lower() or search_term in (c.get('name') or '').lower()]
-            elif filter_field == "code":
-                colleges = [c for c in colleges if search_term in (c.get('code') or '').lower()]
-            elif filter_field == "name":
-                colleges = [c for c in colleges if search_term in (c.get('name') or '').lower()]
+            # Lowercase each searched column once, then join them per row so
+            # every college costs a single substring test
+            lowered = [[(c.get(column) or '').lower() for c in colleges] for column in search_columns]
+            haystacks = ['\0'.join(values) for values in zip(*lowered)]
+            colleges = [c for c, haystack in zip(colleges, haystacks) if search_term in haystack]
 
         # Apply sorting
         reverse = order.lower() == "desc"
         if sort == "code":
-            colleges.sort(key=lambda x: x['code'], reverse=reverse)
-        elif sort == "name":
-            colleges.sort(key=lambda x: x['name'], reverse=reverse)
+            # Rows arrive ordered by code (byte order, same as Python's), and
+            # codes are unique, so only a descending request needs any work
+            if reverse:
+                colleges.reverse()
+        else:
+            sort_key = SORT_KEYS.get(sort)
+            if sort_key:
+                colleges.sort(key=sort_key, reverse=reverse)
 
         # Apply pagination
         total = len(colleges)
@@ -84,12 +104,12 @@ def get_colleges():
         end = start + per_page
         paginated_colleges = colleges[start:end]
 
-        return jsonify({
+        return conditional_jsonify({
             "items": paginated_colleges,
             "total": total,
             "page": page,
             "pages": (total + per_page - 1) // per_page if total > 0 else 0,
-        }), 200
+        })
 
     except Exception as e:
         print(f"Error getting colleges: {e}")
@@ -106,21 +126,10 @@ def get_college(college_identifier):
         if not college:
             return jsonify({"error": "College not found"}), 404
 
-        # Get programs for this college
-        programs = College.get_programs(college['code'])
-
-        # Get student count for each program
-        programs_with_count = []
-        for program in programs or []:
-            student_count = Student.count_students(course_filter=program['code'])
-            programs_with_count.append({
-                "code": program['code'],
-                "name": program['name'],
-                "student_count": student_count
-            })
-
-        # Get total students in this college
-        total_students = College.get_student_count(college['code'])
+        # Programs and their student counts arrive in one grouped query; every
+        # student belongs to exactly one program, so the college total is their sum
+        programs_with_count = College.get_programs_with_student_counts(college['code'])
+        total_students = sum(program['student_count'] for program in programs_with_count)
 
         college_dict = {
             'id': college.get('id'),
@@ -130,7 +139,7 @@ def get_college(college_identifier):
             'total_students': total_students
         }
 
-        return jsonify(college_dict), 200
+        return conditional_jsonify(college_dict)
     except Exception as e:
         print(f"Error getting college: {e}")
         return jsonify({"error": str(e)}), 500
@@ -153,6 +162,7 @@ def create_college():
             code=data["code"].upper().strip(),
             name=data["name"].strip()
         )
+        commit()
 
         # Clear dashboard cache since stats changed
         clear_dashboard_cache()
@@ -163,6 +173,7 @@ def create_college():
         }), 201
 
     except Exception as e:
+        rollback()
         print(f"Error creating college: {e}")
         return jsonify({"error": str(e)}), 500
 
@@ -219,6 +230,7 @@ def update_college(college_identifier):
 
     except Exception as e:
         error_message = str(e)
+        rollback()
         print(f"Error updating college: {e}")
         if "violates foreign key constraint" in error_message:
             return jsonify({
@@ -250,6 +262,7 @@ def delete_college(college_identifier):
         return jsonify({"message": "College deleted successfully"}), 200
 
     except Exception as e:
+        rollback()
         print(f"Error deleting college: {e}")
         return jsonify({"error": str(e)}), 500
 
@@ -1,4 +1,9 @@
-from ..database import get_one, get_all, insert_record, update_record, delete_record, execute_raw_sql, count_records
+from ..database import savepoint, get_all, insert_record, update_record, delete_record, execute_raw_sql, count_records
+
+# Code lookups back every college detail, update, delete and program
+# validation request, so their SQL is built once rather than per call
+COLLEGE_BY_ID_QUERY = "SELECT * FROM college WHERE id = %s"
+COLLEGE_BY_CODE_QUERY = "SELECT * FROM college WHERE code = %s"
 
 class College:
     """College model using Supabase operations"""
@@ -19,17 +24,19 @@ class College:
     @staticmethod
     def get_by_id(college_id):
         """Get college by uniqueID"""
-        return get_one("college", where_clause="id = %s", params=[college_id])
+        result = execute_raw_sql(COLLEGE_BY_ID_QUERY, params=[college_id], fetch=True)
+        return result[0] if result else None
 
     @staticmethod
     def get_by_code(college_code):
         """Get college by code"""
-        return get_one("college", where_clause="code = %s", params=[college_code])
+        result = execute_raw_sql(COLLEGE_BY_CODE_QUERY, params=[college_code], fetch=True)
+        return result[0] if result else None
 
     @staticmethod
     def get_all_colleges():
-        """Get all colleges"""
-        return get_all("college")
+        """Get all colleges, ordered by code"""
+        return get_all("college", order_by='code COLLATE "C"')
 
     @staticmethod
     def create_college(code, name):
@@ -79,13 +86,27 @@ class College:
         """Get all programs for a college"""
         return get_all("program", where_clause="college = %s", params=[college_code])
 
+    @staticmethod
+    def get_programs_with_student_counts(college_code):
+        """Get a college's programs with each one's student count in a single query"""
+        query = """
+            SELECT p.code, p.name, COUNT(s.id) AS student_count
+            FROM program p
+            LEFT JOIN student s ON s.course = p.code
+            WHERE p.college = %s
+            GROUP BY p.code, p.name
+            ORDER BY p.code COLLATE "C"
+        """
+        return execute_raw_sql(query, params=[college_code], fetch=True) or []
+
     @staticmethod
     def get_student_count(college_code):
         """Get total number of students in a college"""
         try:
             # Use PostgreSQL function to get college stats
             query = "SELECT student_count FROM get_college_stats() WHERE college_code = %s"
-            result = execute_raw_sql(query, params=[college_code], fetch=True)
+            with savepoint():
+                result = execute_raw_sql(query, params=[college_code], fetch=True)
             if result and len(result) > 0:
                 return result[0]['student_count'] or 0
             return 0
@@ -99,7 +120,8 @@ class College:
         try:
             # Use PostgreSQL function to get college stats
             query = "SELECT * FROM get_college_stats()"
-            result = execute_raw_sql(query, fetch=True)
+            with savepoint():
+                result = execute_raw_sql(query, fetch=True)
             return result or []
         except Exception as e:
             print(f"Error getting college stats: {e}")
@@ -2,14 +2,35 @@ from flask import Blueprint, request, jsonify
 from .models import Program
 from ..college.models import College
 from ..student.models import Student
+from ..utils import conditional_jsonify
+from ..database import commit, rollback, savepoint
 from ..cache import clear_dashboard_cache
-from ..supabase import get_all, get_one, insert_record, update_record, delete_record, count_records, execute_raw_sql, paginate_query, supabase_manager
+from operator import itemgetter
 import re
 
 program_bp = Blueprint("program", __name__, url_prefix="/programs")
 
-def validate_program_data(data, program_code=None):
-    """Validate program data"""
+# Program fields matched by each ?filter= value of the list search
+SEARCH_FIELDS = {
+    "all": ('code', 'name', 'college_name', 'college'),
+    "code": ('code',),
+    "name": ('name',),
+    "college": ('college', 'college_name'),
+}
+
+# Sort key for each ?sort= value of the list endpoint
+SORT_KEYS = {
+    "code": itemgetter('code'),
+    "name": itemgetter('name'),
+    "college": lambda x: x.get('college_name') or '',
+}
+
+def validate_program_data(data, program_code=None, existing_program=None):
+    """
+    Validate program data
+    existing_program is the row being updated, already fetched by the caller;
+    values it already holds need no lookup
+    """
     errors = []
 
     required_fields = ["code", "name", "college"]
@@ -22,8 +43,9 @@ def validate_program_data(data, program_code=None):
         if not re.match(r"^[A-Za-z0-9\-]{2,10}$", code):
             errors.append("Program code must be 2-10 characters, letters, numbers, and hyphens only")
 
-        # Check if program code already exists using Supabase model
-        existing = Program.get_by_code(code)
+        # Check if program code already exists (an update keeping its own code can't conflict)
+        keeps_code = program_code and code.upper() == program_code.upper()
+        existing = None if keeps_code else Program.get_by_code(code)
         if existing:
             # If this is an update and the existing code is different from current program code, it's a conflict
             if program_code and existing["code"].upper() != program_code.upper():
@@ -39,9 +61,10 @@ def validate_program_data(data, program_code=None):
             errors.append("Program name must not exceed 100 characters")
 
     if "college" in data and data["college"]:
-        # Check if college exists using Supabase model
-        college = College.get_by_code(data["college"].upper())
-        if not college:
+        # Check if college exists; the current college is held in place by the foreign key
+        college_code = data["college"].upper()
+        current_college = (existing_program or {}).get("college")
+        if college_code != current_college and not College.get_by_code(college_code):
             errors.append("Invalid college code")
 
     return errors
@@ -67,31 +90,26 @@ def get_programs():
             programs = [p for p in programs if p['college'].upper() == college_filter.upper()]
         
         # Apply search filter (null-safe)
-        if search:
+        search_columns = SEARCH_FIELDS.get(filter_field)
+        if search and search_columns:
             search_term = search.lower()
-            if filter_field == "all":
-                programs = [p for p in programs if
-                           search_term in (p.get('code') or '').lower() or
-                           search_term in (p.get('name') or '').lower() or
-                           search_term in (p.get('college_name') or '').lower() or
-                           search_term in (p.get('college') or '').lower()]
-            elif filter_field == "code":
-                programs = [p for p in programs if search_term in (p.get('code') or '').lower()]
-            elif filter_field == "name":
-                programs = [p for p in programs if search_term in (p.get('name') or '').lower()]
-            elif filter_field == "college":
-                programs = [p for p in programs if
-                           search_term in (p.get('college') or '').lower() or
-                           search_term in (p.get('college_name') or '').lower()]
+            # Lowercase each searched column once, then join them per row so
+            # every program costs a single substring test
+            lowered = [[(p.get(column) or '').lower() for p in programs] for column in search_columns]
+            haystacks = ['\0'.join(values) for values in zip(*lowered)]
+            programs = [p for p, haystack in zip(programs, haystacks) if search_term in haystack]
 
         # Apply sorting
         reverse = order.lower() == "desc"
         if sort == "code":
-            programs.sort(key=lambda x: x['code'], reverse=reverse)
-        elif sort == "name":
-            programs.sort(key=lambda x: x['name'], reverse=reverse)
-        elif sort == "college":
-            programs.sort(key=lambda x: x.get('college_name', ''), reverse=reverse)
+            # Rows arrive ordered by code (byte order, same as Python's), and
+            # codes are unique, so only a descending request needs any work
+            if reverse:
+                programs.reverse()
+        else:
+            sort_key = SORT_KEYS.get(sort)
+            if sort_key:
+                programs.sort(key=sort_key, reverse=reverse)
 
         # Apply pagination
         total = len(programs)
@@ -99,12 +117,12 @@ def get_programs():
         end = start + per_page
         paginated_programs = programs[start:end]
 
-        return jsonify({
+        return conditional_jsonify({
             "items": paginated_programs,
             "total": total,
             "page": page,
             "pages": (total + per_page - 1) // per_page if total > 0 else 0,
-        }), 200
+        })
     except Exception as e:
         print(f"Error getting programs: {e}")
         return jsonify({"error": str(e)}), 500
@@ -126,19 +144,17 @@ def get_program(program_code):
 
         # Get year distribution stats using Supabase model
         try:
-            students = Student.get_students_by_course(program['code'])
-            year_distribution = {}
-            for student in students or []:
-                year = student['year']
-                year_distribution[year] = year_distribution.get(year, 0) + 1
-            
-            program["year_distribution"] = [{"year": year, "count": count} 
-                                          for year, count in sorted(year_distribution.items())]
+            with savepoint():
+                year_rows = Student.get_year_distribution(program['code'])
+            program["year_distribution"] = [
+                {"year": row['year'], "count": row['count']}
+                for row in year_rows
+            ]
         except Exception as e:
             print(f"Error getting year distribution: {e}")
             program["year_distribution"] = []
 
-        return jsonify(program), 200
+        return conditional_jsonify(program)
     except Exception as e:
         print(f"Error getting program: {e}")
         return jsonify({"error": str(e)}), 500
@@ -162,6 +178,10 @@ def create_program():
             name=data["name"].strip(),
             college=data["college"].upper().strip()
         )
+        commit()
+
+        # Invalidate cached program lookups used by student validation
+        Program.bump_cache_version()
 
         # Clear dashboard cache since stats changed
         clear_dashboard_cache()
@@ -172,6 +192,7 @@ def create_program():
         }), 201
 
     except Exception as e:
+        rollback()
         print(f"Error creating program: {e}")
         return jsonify({"error": str(e)}), 500
 
@@ -189,7 +210,7 @@ def update_program(program_code):
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        errors = validate_program_data(data, program_code.upper())
+        errors = validate_program_data(data, program_code.upper(), existing_program)
         if errors:
             return jsonify({"errors": errors}), 400
 
@@ -221,7 +242,8 @@ def update_program(program_code):
         if not success:
             return jsonify({"error": "Failed to update program"}), 500
 
-        # Note: Programs are now fetched fresh from database for validation (no cache to clear)
+        # Invalidate cached program lookups used by student validation
+        Program.bump_cache_version()
 
         # Get updated program using the new code if it changed
         final_code = update_data.get('code', program_code)
@@ -237,6 +259,7 @@ def update_program(program_code):
         }), 200
 
     except Exception as e:
+        rollback()
         print(f"Error updating program: {e}")
         error_message = str(e)
         if "violates foreign key constraint" in error_message:
@@ -262,12 +285,16 @@ def delete_program(program_code):
         if not rows_deleted:
             return jsonify({"error": "Program not found"}), 404
 
+        # Invalidate cached program lookups used by student validation
+        Program.bump_cache_version()
+
         # Clear dashboard cache since stats changed
         clear_dashboard_cache()
 
         return jsonify({"message": "Program deleted successfully"}), 200
 
     except Exception as e:
+        rollback()
         print(f"Error deleting program: {e}")
         return jsonify({"error": str(e)}), 500
 
@@ -276,35 +303,22 @@ def delete_program(program_code):
 def get_program_stats():
     """Get program statistics"""
     try:
-        # Get program statistics using Supabase model
+        # One grouped query returns every program with its college and student count
         program_stats = Program.get_program_stats()
 
-        # Get programs by college using Supabase model
-        programs = Program.get_all_programs()
         by_college = {}
-        for program in programs or []:
-            college_code = program['college']
+        enrollment = []
+        for row in program_stats:
+            college_code = row['college_code']
             if college_code not in by_college:
                 by_college[college_code] = {'code': college_code, 'count': 0}
             by_college[college_code]['count'] += 1
 
-        # Get enrollment statistics using Supabase model
-        enrollment = []
-        for program in programs or []:
-            try:
-                student_count = Program.get_student_count(program['code'])
-                enrollment.append({
-                    "code": program['code'],
-                    "name": program['name'],
-                    "enrollment": student_count
-                })
-            except Exception as e:
-                print(f"Error counting students for program {program['code']}: {e}")
-                enrollment.append({
-                    "code": program['code'],
-                    "name": program['name'],
-                    "enrollment": 0
-                })
+            enrollment.append({
+                "code": row['program_code'],
+                "name": row['program_name'],
+                "enrollment": row['student_count']
+            })
 
         return jsonify(
             {
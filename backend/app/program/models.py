@@ -1,9 +1,27 @@
-from ..database import get_one, get_all, insert_record, update_record, delete_record, execute_raw_sql, count_records
+from ..database import savepoint, get_all, insert_record, update_record, delete_record, execute_raw_sql, count_records
 from ..college.models import College
 
+# Program codes keep the case they were entered with, so lookups compare
+# upper-cased; the SQL is built once since every program detail, update and
+# student validation miss runs it
+PROGRAM_BY_CODE_QUERY = "SELECT * FROM program WHERE UPPER(code) = %s"
+
 class Program:
     """Program model using Supabase operations"""
 
+    # Bumped on every program mutation so cached program lookups know to refetch
+    _cache_version = 0
+
+    @classmethod
+    def cache_version(cls):
+        """Current version of the program table as seen by this process"""
+        return cls._cache_version
+
+    @classmethod
+    def bump_cache_version(cls):
+        """Invalidate cached program lookups (call after create/update/delete)"""
+        cls._cache_version += 1
+
     @staticmethod
     def create_table():
         """Create program table if it doesn't exist"""
@@ -23,7 +41,8 @@ class Program:
     @staticmethod
     def get_by_code(program_code):
         """Get program by code (case-insensitive)"""
-        return get_one("program", where_clause="UPPER(code) = %s", params=[program_code.upper()])
+        result = execute_raw_sql(PROGRAM_BY_CODE_QUERY, params=[program_code.upper()], fetch=True)
+        return result[0] if result else None
 
     @staticmethod
     def get_all_programs():
@@ -83,7 +102,8 @@ class Program:
         try:
             # Use PostgreSQL function to get program stats
             query = "SELECT * FROM get_program_stats()"
-            result = execute_raw_sql(query, fetch=True)
+            with savepoint():
+                result = execute_raw_sql(query, fetch=True)
             return result or []
         except Exception as e:
             print(f"Error getting program stats: {e}")
@@ -98,8 +118,10 @@ class Program:
                 SELECT p.code, p.name, p.college, c.name as college_name
                 FROM program p
                 LEFT JOIN college c ON p.college = c.code
+                ORDER BY p.code COLLATE "C"
             """
-            result = execute_raw_sql(query, fetch=True)
+            with savepoint():
+                result = execute_raw_sql(query, fetch=True)
             return result or []
         except Exception as e:
             print(f"Error getting programs with college info: {e}")
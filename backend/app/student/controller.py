@@ -1,13 +1,18 @@
-from flask import Blueprint, request, jsonify, session
-from functools import lru_cache
+from flask import Blueprint, Response, request, session, jsonify, stream_with_context
+from itertools import islice
+import csv
+import io
 import logging
-import re
 import os
+import time
 
-from .models import Student
+from config import Config
+from .models import Student, STUDENT_COLUMNS, STUDENT_SELECT, KEYSET_SORT_COLUMNS
+from ..database import commit, rollback, savepoint
+from ..utils import conditional_jsonify
 from ..program.models import Program
 from ..auth.controller import require_auth
-from ..cache import clear_dashboard_cache
+from ..cache import clear_dashboard_cache, get_cached_student_stats
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -17,29 +22,81 @@ student_bp = Blueprint("student", __name__)
 # Constants 
 MAX_PAGE_SIZE = 100
 DEFAULT_PAGE_SIZE = 10
-MAX_FILE_SIZE_MB = 5
+MAX_FILE_SIZE_MB = Config.MAX_PHOTO_SIZE_MB
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
-ALLOWED_IMAGE_TYPES = ['jpeg', 'jpg', 'png', 'webp']
+ALLOWED_IMAGE_TYPES = ('jpeg', 'jpg', 'png', 'webp')
+VALID_GENDERS = frozenset({"male", "female", "non-binary", "prefer not to say", "other"})
+# Upload error messages are fixed, so build them once
+FILE_TOO_LARGE_MESSAGE = f"File too large. Maximum size is {MAX_FILE_SIZE_MB}MB"
+INVALID_IMAGE_MESSAGE = f"Invalid image format. Allowed formats: {', '.join(ALLOWED_IMAGE_TYPES).upper()}"
+DUPLICATE_ID_ERROR = "Student ID already exists"
+IMAGE_SNIFF_BYTES = 12  # Enough leading bytes to identify JPEG, PNG and WEBP
+PROGRAM_CACHE_TTL_SECONDS = 30  # Safety net for program changes made by other workers
+SLOW_CHANGING_MAX_AGE = 30  # Browser cache lifetime (seconds) for stats and program lookups
 
 
 # ============================================
 # PROGRAM VALIDATION
 # ============================================
-def get_valid_programs():
-    """Get all valid programs for validation (always fresh from database)"""
+_PROGRAM_CACHE = {'version': None, 'loaded_at': 0.0, 'codes': None, 'by_code': None, 'code_list': None}
+_EMPTY_PROGRAM_INDEX = (frozenset(), {}, ())
+
+
+def _program_index():
+    """Return (frozenset of upper-cased codes, dict of code -> program, tuple of codes).
+
+    Cached until Program.bump_cache_version() is called or the TTL expires.
+    """
+    version = Program.cache_version()
+    now = time.monotonic()
+    if (_PROGRAM_CACHE['by_code'] is not None
+            and _PROGRAM_CACHE['version'] == version
+            and now - _PROGRAM_CACHE['loaded_at'] < PROGRAM_CACHE_TTL_SECONDS):
+        return _PROGRAM_CACHE['codes'], _PROGRAM_CACHE['by_code'], _PROGRAM_CACHE['code_list']
+
     try:
-        programs = Program.get_all_programs()
-        return {p['code'].upper(): p for p in programs}
+        with savepoint():
+            programs = Program.get_all_programs()
     except Exception as e:
         logger.error(f"Error fetching programs: {e}")
-        return {}
+        return _EMPTY_PROGRAM_INDEX
+
+    by_code = {p['code'].upper(): p for p in programs or []}
+    codes = frozenset(by_code)
+    code_list = tuple(by_code)
+    _PROGRAM_CACHE.update(version=version, loaded_at=now, codes=codes, by_code=by_code, code_list=code_list)
+    return codes, by_code, code_list
+
+
+def get_valid_programs():
+    """Get all valid programs keyed by upper-cased code (for canonical lookups)"""
+    return _program_index()[1]
+
+
+def get_valid_program_codes():
+    """Get the upper-cased program codes (for membership checks)"""
+    return _program_index()[0]
+
+
+def get_valid_program_code_list():
+    """Get the upper-cased program codes as a tuple (for listing in error responses)"""
+    return _program_index()[2]
 
 
 # ============================================
 # VALIDATION
 # ============================================
-def validate_student_data(data, student_id=None):
-    """Validate student data with cached program validation"""
+def is_valid_student_id(sid):
+    """Check the fixed YYYY-NNNN shape without a regex (isascii keeps isdigit to 0-9)"""
+    return (len(sid) == 9 and sid[4] == '-' and sid.isascii()
+            and sid[:4].isdigit() and sid[5:].isdigit())
+
+
+def validate_student_data(data, student_id=None, check_exists=True):
+    """
+    Validate student data with cached program validation
+    check_exists=False skips the duplicate-ID lookup (bulk imports skip existing IDs on insert)
+    """
     errors = []
 
     required_fields = ["id", "firstname", "lastname", "course", "year", "gender"]
@@ -50,17 +107,16 @@ def validate_student_data(data, student_id=None):
     # Validate student ID format
     if "id" in data and data["id"]:
         sid = data["id"].upper()
-        logger.debug(f"Validating student ID: {sid}")
+        logger.debug("Validating student ID: %s", sid)
 
-        if not re.match(r"^[0-9]{4}-[0-9]{4}$", sid):
+        if not is_valid_student_id(sid):
             logger.warning(f"Invalid ID format: {sid}")
             errors.append("Student ID must follow format YYYY-NNNN (e.g., 2024-0001)")
         else:
-            # Check if ID already exists
-            existing = Student.get_by_id(sid)
-            if existing and (not student_id or existing["id"] != student_id):
+            # Check if ID already exists (an update may keep its own ID)
+            if check_exists and (not student_id or sid != student_id.upper()) and Student.exists(sid):
                 logger.warning(f"Duplicate student ID: {sid}")
-                errors.append("Student ID already exists")
+                errors.append(DUPLICATE_ID_ERROR)
 
     # Validate year
     if "year" in data and data["year"]:
@@ -73,17 +129,15 @@ def validate_student_data(data, student_id=None):
 
     # Validate gender
     if "gender" in data and data["gender"]:
-        valid_genders = ["male", "female", "non-binary", "prefer not to say", "other"]
-        if data["gender"].lower() not in valid_genders:
+        if data["gender"].lower() not in VALID_GENDERS:
             errors.append("Gender must be Male, Female, Non-binary, Prefer not to say, or Other")
 
-    # Validate program (always fresh from database)
+    # Validate program against the cached program index (refreshed on program changes or after PROGRAM_CACHE_TTL_SECONDS)
     if "course" in data and data["course"]:
-        valid_programs = get_valid_programs()
         course_upper = data["course"].upper()
-        
-        if course_upper not in valid_programs:
-            available = list(valid_programs.keys())[:5]
+
+        if course_upper not in get_valid_program_codes():
+            available = list(islice(get_valid_programs(), 5))
             error_msg = f"Invalid program code '{data['course']}'"
             if available:
                 error_msg += f". Available: {', '.join(available)}..."
@@ -92,96 +146,270 @@ def validate_student_data(data, student_id=None):
     return errors
 
 
+def parse_fields_param(raw_fields):
+    """Parse ?fields= into an allow-listed tuple of student columns (None means all)"""
+    if not raw_fields:
+        return None
+
+    requested = {f.strip().lower() for f in raw_fields.split(",") if f.strip()}
+    fields = tuple(c for c in STUDENT_COLUMNS if c in requested)
+    return fields or None
+
+
+# ============================================
+# PHOTO VALIDATION
+# ============================================
+def sniff_image_type(header):
+    """Identify an image from its leading bytes: 'jpeg', 'png', 'webp' or None"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def upload_size(file):
+    """Size of an uploaded file in bytes, measured by seeking rather than reading"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def read_image_upload(file):
+    """
+    Read an uploaded image, rejecting oversize files before any bytes are
+    read and validating the magic bytes before reading the rest.
+    Returns (file_data, image_type, error_message).
+    """
+    size = upload_size(file)
+    if size > MAX_FILE_SIZE_BYTES:
+        logger.warning(f"File too large: {size} bytes")
+        return None, None, FILE_TOO_LARGE_MESSAGE
+
+    header = file.stream.read(IMAGE_SNIFF_BYTES)
+    image_type = sniff_image_type(header)
+    if image_type is None:
+        logger.warning(f"Invalid image content: {file.filename}")
+        return None, None, INVALID_IMAGE_MESSAGE
+
+    return header + file.stream.read(MAX_FILE_SIZE_BYTES - len(header)), image_type, None
+
+
+def handle_photo_upload(photo_file, student_id, failure_status=400):
+    """
+    Validate an uploaded photo and attach it to an existing student.
+    Returns (True, upload_result) on success or (False, (response, status))
+    ready to be returned from the view.
+    """
+    file_data, image_type, error = read_image_upload(photo_file)
+    if error:
+        return False, (jsonify({"error": error}), 400)
+
+    logger.info(f"Uploading photo for student: {student_id}")
+
+    # Extension taken from the sniffed content, not the client's filename
+    result = Student.upload_profile_photo(
+        student_id=student_id,
+        file_data=file_data,
+        filename=f"{os.path.splitext(photo_file.filename)[0]}.{image_type}"
+    )
+
+    if result.get('not_found'):
+        return False, (jsonify({"error": "Student not found"}), 404)
+    if not result['success']:
+        logger.error(f"Photo upload failed for {student_id}: {result.get('error')}")
+        return False, (jsonify({"error": f"Photo upload failed: {result.get('error', 'Unknown error')}"}), failure_status)
+
+    commit_photo_write(student_id, result['filename'])
+    # The committed record now points at the new photo, so the old one can go
+    Student.queue_photo_removal(student_id, result.get('previous_filename'))
+
+    logger.info(f"Photo uploaded successfully: {student_id}")
+    return True, result
+
+
+def start_photo_upload(photo_file, student_id):
+    """
+    Validate an uploaded photo and start storing it in the background, so the
+    caller's INSERT/UPDATE (which carries the photo columns) overlaps the upload.
+    Returns (True, (future, url, filename)) or (False, (response, status)).
+    """
+    file_data, image_type, error = read_image_upload(photo_file)
+    if error:
+        return False, (jsonify({"error": error}), 400)
+
+    logger.info(f"Uploading photo for student: {student_id}")
+
+    # Extension taken from the sniffed content, not the client's filename
+    return True, Student.start_photo_upload(
+        student_id,
+        file_data,
+        f"{os.path.splitext(photo_file.filename)[0]}.{image_type}"
+    )
+
+
+def finish_photo_upload(pending, student_id):
+    """
+    Wait for an upload begun by start_photo_upload.
+    Returns None once the photo is stored; on failure the request's student
+    write is rolled back and a (response, status) is returned instead.
+    """
+    future = pending[0]
+    try:
+        future.result()
+    except Exception as e:
+        rollback()
+        logger.error(f"Photo upload failed for {student_id}: {e}")
+        return jsonify({"error": f"Photo upload failed: {e}"}), 400
+
+    logger.info(f"Photo uploaded successfully: {student_id}")
+    return None
+
+
+def commit_photo_write(student_id, filename):
+    """
+    Commit a student write that points at a freshly stored photo.
+    If the commit fails nothing references the file, so it is queued for
+    removal before the error propagates.
+    """
+    try:
+        commit()
+    except Exception:
+        Student.queue_photo_removal(student_id, filename)
+        raise
+
+
+def build_list_filters(valid_programs, search, filter_field, course_filter, year_filter, gender_filter):
+    """Translate the list query args into Student.build_filter_clause's (where_clause, params)
+    year_filter is already an int (or None)"""
+    # Match the stored program code exactly so the course index can be used
+    course_code = None
+    if course_filter:
+        program = valid_programs.get(course_filter.upper())
+        course_code = program['code'] if program else course_filter.upper()
+
+    return Student.build_filter_clause(
+        search=search,
+        filter_field=filter_field,
+        course=course_code,
+        year=year_filter,
+        gender=gender_filter
+    )
+
+
+def add_course_names(students, valid_programs):
+    """Enrich student rows with course_name for display (in place; returns the rows)"""
+    for student in students:
+        course_code = student.get('course')
+        program = valid_programs.get(course_code.upper()) if course_code else None
+        if program:
+            student['course_name'] = program.get('name')
+    return students
+
+
+def next_cursor(rows, sort):
+    """Cursor for the row after the last one returned, or None when it can't be built"""
+    if not rows or sort not in KEYSET_SORT_COLUMNS:
+        return None
+    last = rows[-1]
+    if 'id' not in last or sort not in last:
+        return None
+    return {"after_id": last['id'], "after_value": last[sort]}
+
+
 # ============================================
 # STUDENT CRUD ENDPOINTS
 # ============================================
 @student_bp.route("", methods=["GET"])
 @require_auth
 def get_students():
-    """Get students with in-memory filtering (consistent with colleges/programs)"""
+    """Get students with filtering, sorting and pagination done in SQL"""
     try:
-        page = request.args.get("page", 1, type=int)
+        page = max(request.args.get("page", 1, type=int), 1)
         per_page = min(request.args.get("per_page", DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE)
         search = request.args.get("search", "", type=str)
         filter_field = request.args.get("filter", "all", type=str)
         sort = request.args.get("sort", "id", type=str)
         order = request.args.get("order", "asc", type=str)
         course_filter = request.args.get("course", "", type=str)
-        year_filter = request.args.get("year", "", type=str)
+        # Parsed once here; a non-numeric year is ignored rather than failing the request
+        year_filter = request.args.get("year", type=int)
         gender_filter = request.args.get("gender", "", type=str)
+        fields = parse_fields_param(request.args.get("fields", "", type=str))
+        after_id = request.args.get("after_id", "", type=str)
+
+        logger.debug("Get students: page=%s, search='%s', filter=%s, course=%s, year=%s, gender=%s, fields=%s",
+                     page, search, filter_field, course_filter, year_filter, gender_filter, fields)
 
-        logger.debug(f"Get students: page={page}, search='{search}', filter={filter_field}, course={course_filter}, year={year_filter}, gender={gender_filter}")
-
-        # Get all students first
-        students = Student.get_all_students()
-
-        # Filter by course, year, and gender first
-        if course_filter:
-            students = [s for s in students if s.get('course') and s['course'].upper() == course_filter.upper()]
-
-        if year_filter:
-            year = int(year_filter)
-            students = [s for s in students if s.get('year') == year]
-
-        if gender_filter:
-            students = [s for s in students if s.get('gender') and s['gender'].lower() == gender_filter.lower()]
-
-        # Apply search filter (case-insensitive)
-        if search:
-            search_term = search.lower()
-            if filter_field == "all":
-                students = [s for s in students if
-                           search_term in (s.get('id') or '').lower() or
-                           search_term in (s.get('firstname') or '').lower() or
-                           search_term in (s.get('lastname') or '').lower() or
-                           search_term in ((s.get('firstname') or '') + ' ' + (s.get('lastname') or '')).strip().lower() or
-                           search_term in (s.get('course') or '').lower()]
-            elif filter_field == "id":
-                students = [s for s in students if search_term in (s.get('id') or '').lower()]
-            elif filter_field == "firstname":
-                students = [s for s in students if search_term in (s.get('firstname') or '').lower()]
-            elif filter_field == "lastname":
-                students = [s for s in students if search_term in (s.get('lastname') or '').lower()]
-            elif filter_field in ["name", "fullname"]:
-                students = [s for s in students if
-                           search_term in ((s.get('firstname') or '') + ' ' + (s.get('lastname') or '')).strip().lower()]
-            elif filter_field == "course":
-                students = [s for s in students if search_term in (s.get('course') or '').lower()]
-
-        # Apply sorting
-        reverse = order.lower() == "desc"
-        if sort == "id":
-            students.sort(key=lambda x: x['id'], reverse=reverse)
-        elif sort == "firstname":
-            students.sort(key=lambda x: x['firstname'], reverse=reverse)
-        elif sort == "lastname":
-            students.sort(key=lambda x: x['lastname'], reverse=reverse)
-        elif sort == "course":
-            students.sort(key=lambda x: x.get('course') or '', reverse=reverse)
-        elif sort == "year":
-            students.sort(key=lambda x: x['year'], reverse=reverse)
-        elif sort == "gender":
-            students.sort(key=lambda x: x['gender'], reverse=reverse)
-
-        # Apply pagination
-        total = len(students)
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_students = students[start:end]
-
-        # Enrich with course_name for display
         valid_programs = get_valid_programs()
-        for student in paginated_students:
-            course_code = student.get('course')
-            if course_code and course_code.upper() in valid_programs:
-                student['course_name'] = valid_programs[course_code.upper()].get('name')
 
-        return jsonify({
+        # Keyset (seek) pagination: continue after a cursor instead of skipping
+        # OFFSET rows, so deep pages cost the same as the first one
+        if after_id and sort in KEYSET_SORT_COLUMNS:
+            where_clause, params = build_list_filters(
+                valid_programs, search, filter_field, course_filter, year_filter, gender_filter
+            )
+            students, cursor = Student.get_all_students_keyset(
+                where_clause=where_clause,
+                params=params,
+                order_by=sort,
+                order_direction=order,
+                limit=per_page,
+                cursor={"after_id": after_id, "after_value": request.args.get("after_value", "", type=str)},
+                columns=", ".join(fields) if fields else STUDENT_SELECT
+            )
+            add_course_names(students, valid_programs)
+
+            return conditional_jsonify({
+                "items": students,
+                "per_page": per_page,
+                "has_more": cursor is not None,
+                "next_cursor": cursor,
+            })
+
+        where_clause, params = build_list_filters(
+            valid_programs, search, filter_field, course_filter, year_filter, gender_filter
+        )
+
+        offset = (page - 1) * per_page
+        paginated_students = Student.get_all_students_filtered(
+            where_clause=where_clause,
+            params=params,
+            order_by=sort,
+            order_direction=order,
+            limit=per_page,
+            offset=offset,
+            columns=", ".join(fields) if fields else STUDENT_SELECT,
+            with_total=True
+        )
+        # The total rides along on every row (COUNT(*) OVER ()), so no
+        # second query is needed unless the page came back empty
+        total = paginated_students[0].get('total_count') if paginated_students else None
+        for row in paginated_students:
+            row.pop('total_count', None)
+        if total is None:
+            # Only an empty first page proves there are no matches; otherwise
+            # (a page past the end, or rows without total_count) count them
+            if offset == 0 and not paginated_students:
+                total = 0
+            else:
+                total = Student.count_students_filtered(where_clause, params)
+
+        add_course_names(paginated_students, valid_programs)
+
+        # Status comes from the response itself so a 304 is not overridden
+        return conditional_jsonify({
             "items": paginated_students,
             "total": total,
             "page": page,
             "pages": (total + per_page - 1) // per_page if total > 0 else 0,
-        }), 200
+            "next_cursor": next_cursor(paginated_students, sort) if page * per_page < total else None,
+        })
 
     except Exception as e:
         logger.error(f"Error getting students: {e}", exc_info=True)
@@ -193,14 +421,14 @@ def get_students():
 def get_student(student_id):
     """Get specific student by ID"""
     try:
-        logger.debug(f"Fetching student: {student_id}")
+        logger.debug("Fetching student: %s", student_id)
         student = Student.get_by_id(student_id.upper())
 
         if not student:
             logger.warning(f"Student not found: {student_id}")
             return jsonify({"error": "Student not found"}), 404
 
-        return jsonify(student), 200
+        return conditional_jsonify(student)
 
     except Exception as e:
         logger.error(f"Error fetching student {student_id}: {e}", exc_info=True)
@@ -212,14 +440,13 @@ def get_student(student_id):
 def create_student():
     """Create new student with optional photo upload"""
     try:
-        # Check if this is a multipart/form-data request (with photo)
-        if request.content_type and 'multipart/form-data' in request.content_type:
+        # Multipart requests carry a photo; anything else is JSON (backward compatible)
+        if request.mimetype == 'multipart/form-data':
             return create_student_with_photo()
-        else:
-            # Handle traditional JSON request (backward compatibility)
-            return create_student_json()
+        return create_student_json()
 
     except Exception as e:
+        rollback()
         logger.error(f"Error creating student: {e}", exc_info=True)
         return jsonify({"error": "Failed to create student"}), 500
 
@@ -230,18 +457,19 @@ def create_student_json():
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    errors = validate_student_data(data)
+    # The INSERT itself rejects a taken ID, so skip the separate lookup
+    errors = validate_student_data(data, check_exists=False)
     if errors:
         logger.warning(f"Student creation validation failed: {errors}")
         return jsonify({"errors": errors}), 400
 
-    # Get exact program code
-    valid_programs = get_valid_programs()
+    # Normalise each field once
+    sid = data["id"].strip().upper()
     course_upper = data["course"].upper()
-    actual_program = valid_programs.get(course_upper)
+    actual_program = get_valid_programs().get(course_upper)
 
     new_student = Student.create_student(
-        student_id=data["id"].upper().strip(),
+        student_id=sid,
         firstname=data["firstname"].strip(),
         lastname=data["lastname"].strip(),
         course=actual_program["code"] if actual_program else course_upper,
@@ -250,6 +478,9 @@ def create_student_json():
         profile_photo_url=data.get("profile_photo_url"),
         profile_photo_filename=data.get("profile_photo_filename")
     )
+    if new_student is None:
+        return jsonify({"errors": [DUPLICATE_ID_ERROR]}), 400
+    commit()
 
     logger.info(f"Student created: {new_student['id']}")
 
@@ -264,98 +495,90 @@ def create_student_json():
 
 def create_student_with_photo():
     """Create student with photo upload"""
-    try:
-        # Get form data
-        student_id = request.form.get('id')
-        firstname = request.form.get('firstname')
-        lastname = request.form.get('lastname')
-        course = request.form.get('course')
-        year = request.form.get('year')
-        gender = request.form.get('gender')
-
-        if not all([student_id, firstname, lastname, course, year, gender]):
-            return jsonify({"error": "All student fields are required"}), 400
-
-        # Prepare data for validation
-        data = {
-            'id': student_id,
-            'firstname': firstname,
-            'lastname': lastname,
-            'course': course,
-            'year': year,
-            'gender': gender
-        }
-
-        errors = validate_student_data(data)
-        if errors:
-            logger.warning(f"Student creation with photo validation failed: {errors}")
-            return jsonify({"errors": errors}), 400
-
-        # Get exact program code
-        valid_programs = get_valid_programs()
-        course_upper = data["course"].upper()
-        actual_program = valid_programs.get(course_upper)
-
-        # Handle photo if provided
-        profile_photo_url = None
-        profile_photo_filename = None
-
-        photo_file = request.files.get('photo')
-        if photo_file and photo_file.filename:
-            # Validate file size
-            file_data = photo_file.read()
-            if len(file_data) > MAX_FILE_SIZE_BYTES:
-                logger.warning(f"File too large: {len(file_data)} bytes")
-                return jsonify({"error": f"File too large. Maximum size is {MAX_FILE_SIZE_MB}MB"}), 400
-
-            # Validate image format
-            filename_lower = photo_file.filename.lower()
-            if not any(filename_lower.endswith(ext) for ext in ALLOWED_IMAGE_TYPES):
-                logger.warning(f"Invalid file extension: {photo_file.filename}")
-                return jsonify({"error": f"Invalid image format. Allowed formats: {', '.join(ALLOWED_IMAGE_TYPES).upper()}"}), 400
-
-            logger.info(f"Uploading photo during student creation: {student_id.upper()}")
-
-            # Upload photo
-            result = Student.upload_profile_photo(
-                student_id=student_id.upper(),
-                file_data=file_data,
-                filename=photo_file.filename
-            )
+    # Get form data
+    student_id = request.form.get('id')
+    firstname = request.form.get('firstname')
+    lastname = request.form.get('lastname')
+    course = request.form.get('course')
+    year = request.form.get('year')
+    gender = request.form.get('gender')
+
+    if not all([student_id, firstname, lastname, course, year, gender]):
+        return jsonify({"error": "All student fields are required"}), 400
+
+    # Prepare data for validation
+    data = {
+        'id': student_id,
+        'firstname': firstname,
+        'lastname': lastname,
+        'course': course,
+        'year': year,
+        'gender': gender
+    }
+
+    # The INSERT itself rejects a taken ID, so skip the separate lookup
+    errors = validate_student_data(data, check_exists=False)
+    if errors:
+        logger.warning(f"Student creation with photo validation failed: {errors}")
+        return jsonify({"errors": errors}), 400
 
-            if result['success']:
-                profile_photo_url = result['url']
-                profile_photo_filename = result['filename']
-                logger.info(f"Photo uploaded successfully during student creation: {student_id.upper()}")
-            else:
-                logger.error(f"Photo upload failed during student creation: {result.get('error')}")
-                return jsonify({"error": f"Photo upload failed: {result.get('error', 'Unknown error')}"}), 400
+    # Normalise each field once
+    sid = student_id.strip().upper()
+    course_upper = course.upper()
+    actual_program = get_valid_programs().get(course_upper)
+
+    # Handle photo if provided
+    profile_photo_url = None
+    profile_photo_filename = None
 
-        # Create student
+    pending_photo = None
+
+    photo_file = request.files.get('photo')
+    if photo_file and photo_file.filename:
+        # The row doesn't exist yet; the INSERT below carries the photo columns
+        # and runs while the upload is in flight
+        ok, payload = start_photo_upload(photo_file, sid)
+        if not ok:
+            return payload
+        pending_photo = payload
+        _, profile_photo_url, profile_photo_filename = pending_photo
+
+    # Create student
+    try:
         new_student = Student.create_student(
-            student_id=data["id"].upper().strip(),
-            firstname=data["firstname"].strip(),
-            lastname=data["lastname"].strip(),
+            student_id=sid,
+            firstname=firstname.strip(),
+            lastname=lastname.strip(),
             course=actual_program["code"] if actual_program else course_upper,
-            year=int(data["year"]),
-            gender=data["gender"].capitalize(),
+            year=int(year),
+            gender=gender.capitalize(),
             profile_photo_url=profile_photo_url,
             profile_photo_filename=profile_photo_filename
         )
+    except Exception:
+        if pending_photo:
+            Student.discard_photo_upload(pending_photo[0], sid, profile_photo_filename)
+        raise
+    if new_student is None:
+        if pending_photo:
+            Student.discard_photo_upload(pending_photo[0], sid, profile_photo_filename)
+        return jsonify({"errors": [DUPLICATE_ID_ERROR]}), 400
+
+    if pending_photo:
+        error_response = finish_photo_upload(pending_photo, sid)
+        if error_response:
+            return error_response
+    commit_photo_write(sid, profile_photo_filename)
+
+    logger.info(f"Student with photo created: {new_student['id']}")
 
-        logger.info(f"Student with photo created: {new_student['id']}")
-
-        # Clear dashboard cache since stats changed
-        clear_dashboard_cache()
-
-        return jsonify({
-            "message": "Student created successfully" + (" with photo" if profile_photo_filename else ""),
-            "student": new_student
-        }), 201
+    # Clear dashboard cache since stats changed
+    clear_dashboard_cache()
 
-    except Exception as e:
-        logger.error(f"Error creating student with photo: {e}", exc_info=True)
-        return jsonify({"error": "Failed to create student"}), 500
+    return jsonify({
+        "message": "Student created successfully" + (" with photo" if profile_photo_filename else ""),
+        "student": new_student
+    }), 201
 
 
 @student_bp.route("/<student_id>", methods=["PUT"])
@@ -363,197 +586,207 @@ def create_student_with_photo():
 def update_student(student_id):
     """Update existing student with optional photo upload"""
     try:
-        # Check if this is a multipart/form-data request (with photo)
-        if request.content_type and 'multipart/form-data' in request.content_type:
+        # Multipart requests carry a photo; anything else is JSON (backward compatible)
+        if request.mimetype == 'multipart/form-data':
             return update_student_with_photo(student_id)
-        else:
-            # Handle traditional JSON request (backward compatibility)
-            return update_student_json(student_id)
+        return update_student_json(student_id)
 
     except Exception as e:
+        rollback()
         logger.error(f"Error updating student: {e}", exc_info=True)
         return jsonify({"error": "Failed to update student"}), 500
 
 
 def update_student_json(student_id):
     """Update student from JSON data (backward compatible)"""
-    try:
-        student = Student.get_by_id(student_id.upper())
-        if not student:
-            return jsonify({"error": "Student not found"}), 404
-
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-
-        errors = validate_student_data(data, student_id.upper())
-        if errors:
-            logger.warning(f"Student update validation failed: {errors}")
-            return jsonify({"errors": errors}), 400
+    original_id = student_id.upper()
+    student = Student.get_by_id(original_id)
+    if not student:
+        return jsonify({"error": "Student not found"}), 404
 
-        # Handle year conversion
-        year_value = None
-        if data.get("year"):
-            try:
-                year_value = int(data["year"])
-            except (ValueError, TypeError):
-                year_value = None
-
-        # Check if ID is being updated
-        new_id = data.get("id", "").strip().upper() if data.get("id") else None
-        original_id = student_id.upper()
-        id_changed = new_id and new_id != original_id
-
-        logger.debug(f"Updating student: {original_id}" + (f" (changing ID to: {new_id})" if id_changed else ""))
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
 
-        success = Student.update_student(
-            student_id=original_id,
-            firstname=data.get("firstname", "").strip() if data.get("firstname") else None,
-            lastname=data.get("lastname", "").strip() if data.get("lastname") else None,
-            course=data.get("course", "").upper().strip() if data.get("course") else None,
-            year=year_value,
-            gender=data.get("gender", "").capitalize() if data.get("gender") else None,
-            new_id=new_id if id_changed else None,
-            profile_photo_url=data.get("profile_photo_url"),
-            profile_photo_filename=data.get("profile_photo_filename")
-        )
+    errors = validate_student_data(data, original_id)
+    if errors:
+        logger.warning(f"Student update validation failed: {errors}")
+        return jsonify({"errors": errors}), 400
 
-        if not success:
-            return jsonify({"error": "Student not found or no changes made"}), 404
+    # Handle year conversion
+    year_value = None
+    if data.get("year"):
+        try:
+            year_value = int(data["year"])
+        except (ValueError, TypeError):
+            year_value = None
+
+    # Normalise each provided field once
+    firstname = data.get("firstname")
+    lastname = data.get("lastname")
+    gender = data.get("gender")
+    course_code = None
+    if data.get("course"):
+        course_upper = data["course"].strip().upper()
+        actual_program = get_valid_programs().get(course_upper)
+        course_code = actual_program["code"] if actual_program else course_upper
+
+    # Check if ID is being updated
+    raw_id = data.get("id")
+    new_id = raw_id.strip().upper() if raw_id else None
+    id_changed = new_id and new_id != original_id
+
+    logger.debug(f"Updating student: {original_id}" + (f" (changing ID to: {new_id})" if id_changed else ""))
+
+    updated_student = Student.update_student(
+        student_id=original_id,
+        firstname=firstname.strip() if firstname else None,
+        lastname=lastname.strip() if lastname else None,
+        course=course_code,
+        year=year_value,
+        gender=gender.capitalize() if gender else None,
+        new_id=new_id if id_changed else None,
+        profile_photo_url=data.get("profile_photo_url"),
+        profile_photo_filename=data.get("profile_photo_filename")
+    )
 
-        # If ID changed, get student by new ID; otherwise use original ID
-        lookup_id = new_id if id_changed else original_id
-        updated_student = Student.get_by_id(lookup_id)
-        logger.info(f"Student updated: {original_id}" + (f" (now: {lookup_id})" if id_changed else ""))
+    if not updated_student:
+        return jsonify({"error": "Student not found or no changes made"}), 404
+    commit()
+    # The JSON API only records photo columns; their files are managed elsewhere
+    updated_student.pop('previous_photo_filename', None)
 
-        # Clear dashboard cache since stats may have changed
-        clear_dashboard_cache()
+    # UPDATE ... RETURNING hands back the row, so no second lookup is needed
+    lookup_id = updated_student['id']
+    logger.info(f"Student updated: {original_id}" + (f" (now: {lookup_id})" if id_changed else ""))
 
-        return jsonify({
-            "message": "Student updated successfully",
-            "student": updated_student
-        }), 200
+    # Clear dashboard cache since stats may have changed
+    clear_dashboard_cache()
 
-    except Exception as e:
-        logger.error(f"Error updating student with JSON: {e}", exc_info=True)
-        return jsonify({"error": "Failed to update student"}), 500
+    return jsonify({
+        "message": "Student updated successfully",
+        "student": updated_student
+    }), 200
 
 
 def update_student_with_photo(student_id):
     """Update student with photo upload"""
-    try:
-        student = Student.get_by_id(student_id.upper())
-        if not student:
-            return jsonify({"error": "Student not found"}), 404
-
-        # Get form data (including ID for potential update)
-        data = {
-            'id': request.form.get('id'),
-            'firstname': request.form.get('firstname'),
-            'lastname': request.form.get('lastname'),
-            'course': request.form.get('course'),
-            'year': request.form.get('year'),
-            'gender': request.form.get('gender')
-        }
-
-        # Remove None values for validation (but keep ID if provided)
-        data = {k: v for k, v in data.items() if v is not None or k == 'id'}
-
-        # Validate only provided fields (partial update)
-        errors = []
-        if data:
-            # Only validate provided fields
-            temp_data = dict(student)  # Start with existing data
-            temp_data.update(data)  # Update with new values
-            errors = validate_student_data(temp_data, student_id.upper())
-
-        if errors:
-            logger.warning(f"Student update with photo validation failed: {errors}")
-            return jsonify({"errors": errors}), 400
-
-        # Handle year conversion
-        year_value = None
-        if data.get("year"):
-            try:
-                year_value = int(data["year"])
-            except (ValueError, TypeError):
-                year_value = None
-
-        # Handle photo if provided
-        profile_photo_url = None
-        profile_photo_filename = None
-
-        photo_file = request.files.get('photo')
-        if photo_file and photo_file.filename:
-            # Validate file size
-            file_data = photo_file.read()
-            if len(file_data) > MAX_FILE_SIZE_BYTES:
-                logger.warning(f"File too large: {len(file_data)} bytes")
-                return jsonify({"error": f"File too large. Maximum size is {MAX_FILE_SIZE_MB}MB"}), 400
-
-            # Validate image format
-            filename_lower = photo_file.filename.lower()
-            if not any(filename_lower.endswith(ext) for ext in ALLOWED_IMAGE_TYPES):
-                logger.warning(f"Invalid file extension: {photo_file.filename}")
-                return jsonify({"error": f"Invalid image format. Allowed formats: {', '.join(ALLOWED_IMAGE_TYPES).upper()}"}), 400
-
-            logger.info(f"Uploading photo during student update: {student_id.upper()}")
-
-            # Upload photo
-            result = Student.upload_profile_photo(
-                student_id=student_id.upper(),
-                file_data=file_data,
-                filename=photo_file.filename
-            )
-
-            if result['success']:
-                profile_photo_url = result['url']
-                profile_photo_filename = result['filename']
-                logger.info(f"Photo uploaded successfully during student update: {student_id.upper()}")
-            else:
-                logger.error(f"Photo upload failed during student update: {result.get('error')}")
-                return jsonify({"error": f"Photo upload failed: {result.get('error', 'Unknown error')}"}), 400
-
-        # Check if ID is being updated
-        new_id = data.get("id", "").strip().upper() if data.get("id") else None
-        original_id = student_id.upper()
-        id_changed = new_id and new_id != original_id
+    original_id = student_id.upper()
+    student = Student.get_by_id(original_id)
+    if not student:
+        return jsonify({"error": "Student not found"}), 404
+
+    # Get form data (including ID for potential update)
+    data = {
+        'id': request.form.get('id'),
+        'firstname': request.form.get('firstname'),
+        'lastname': request.form.get('lastname'),
+        'course': request.form.get('course'),
+        'year': request.form.get('year'),
+        'gender': request.form.get('gender')
+    }
+
+    # Remove None values for validation (but keep ID if provided)
+    data = {k: v for k, v in data.items() if v is not None or k == 'id'}
+
+    # Validate only provided fields (partial update)
+    errors = []
+    if data:
+        # Only validate provided fields
+        temp_data = dict(student)  # Start with existing data
+        temp_data.update(data)  # Update with new values
+        errors = validate_student_data(temp_data, original_id)
 
-        logger.debug(f"Updating student with photo: {original_id}" + (f" (changing ID to: {new_id})" if id_changed else ""))
+    if errors:
+        logger.warning(f"Student update with photo validation failed: {errors}")
+        return jsonify({"errors": errors}), 400
 
-        # Update student data (only provided fields)
-        success = Student.update_student(
+    # Handle year conversion
+    year_value = None
+    if data.get("year"):
+        try:
+            year_value = int(data["year"])
+        except (ValueError, TypeError):
+            year_value = None
+
+    # Handle photo if provided
+    profile_photo_url = None
+    profile_photo_filename = None
+    pending_photo = None
+
+    photo_file = request.files.get('photo')
+    if photo_file and photo_file.filename:
+        # The UPDATE below writes the photo columns with the other fields
+        # and runs while the upload is in flight
+        ok, payload = start_photo_upload(photo_file, original_id)
+        if not ok:
+            return payload
+        pending_photo = payload
+        _, profile_photo_url, profile_photo_filename = pending_photo
+
+    # Normalise each provided field once
+    firstname = data.get("firstname")
+    lastname = data.get("lastname")
+    gender = data.get("gender")
+    course_code = None
+    if data.get("course"):
+        course_upper = data["course"].strip().upper()
+        actual_program = get_valid_programs().get(course_upper)
+        course_code = actual_program["code"] if actual_program else course_upper
+
+    # Check if ID is being updated
+    raw_id = data.get("id")
+    new_id = raw_id.strip().upper() if raw_id else None
+    id_changed = new_id and new_id != original_id
+
+    logger.debug(f"Updating student with photo: {original_id}" + (f" (changing ID to: {new_id})" if id_changed else ""))
+
+    # Update student data (only provided fields)
+    try:
+        updated_student = Student.update_student(
             student_id=original_id,
-            firstname=data.get("firstname", "").strip() if data.get("firstname") else None,
-            lastname=data.get("lastname", "").strip() if data.get("lastname") else None,
-            course=data.get("course", "").upper().strip() if data.get("course") else None,
+            firstname=firstname.strip() if firstname else None,
+            lastname=lastname.strip() if lastname else None,
+            course=course_code,
             year=year_value,
-            gender=data.get("gender", "").capitalize() if data.get("gender") else None,
+            gender=gender.capitalize() if gender else None,
             new_id=new_id if id_changed else None,
             profile_photo_url=profile_photo_url,
             profile_photo_filename=profile_photo_filename
         )
+    except Exception:
+        if pending_photo:
+            Student.discard_photo_upload(pending_photo[0], original_id, profile_photo_filename)
+        raise
+
+    if not updated_student:
+        if pending_photo:
+            Student.discard_photo_upload(pending_photo[0], original_id, profile_photo_filename)
+        return jsonify({"error": "Student not found or no changes made"}), 404
+
+    if pending_photo:
+        error_response = finish_photo_upload(pending_photo, original_id)
+        if error_response:
+            return error_response
+    commit_photo_write(original_id, profile_photo_filename)
+
+    # The record now points at the new photo, so the file the UPDATE replaced can go
+    previous_filename = updated_student.pop('previous_photo_filename', None)
+    if profile_photo_filename:
+        Student.queue_photo_removal(original_id, previous_filename)
+
+    # UPDATE ... RETURNING hands back the row, so no second lookup is needed
+    lookup_id = updated_student['id']
+    logger.info(f"Student with photo updated: {original_id}" + (f" (now: {lookup_id})" if id_changed else ""))
+
+    # Clear dashboard cache since stats may have changed
+    clear_dashboard_cache()
 
-        if not success:
-            return jsonify({"error": "Student not found or no changes made"}), 404
-
-        # If ID changed, get student by new ID; otherwise use original ID
-        lookup_id = new_id if id_changed else original_id
-        updated_student = Student.get_by_id(lookup_id)
-        logger.info(f"Student with photo updated: {original_id}" + (f" (now: {lookup_id})" if id_changed else ""))
-
-        # Clear dashboard cache since stats may have changed
-        clear_dashboard_cache()
-
-        photo_message = " with photo" if profile_photo_filename else ""
-        return jsonify({
-            "message": f"Student updated successfully{photo_message}",
-            "student": updated_student
-        }), 200
-
-    except Exception as e:
-        logger.error(f"Error updating student with photo: {e}", exc_info=True)
-        return jsonify({"error": "Failed to update student"}), 500
+    photo_message = " with photo" if profile_photo_filename else ""
+    return jsonify({
+        "message": f"Student updated successfully{photo_message}",
+        "student": updated_student
+    }), 200
 
 
 @student_bp.route("/<student_id>", methods=["DELETE"])
@@ -561,16 +794,11 @@ def update_student_with_photo(student_id):
 def delete_student(student_id):
     """Delete student"""
     try:
-        student = Student.get_by_id(student_id.upper())
-        if not student:
+        sid = student_id.upper()
+        if not Student.delete_student(sid):
             return jsonify({"error": "Student not found"}), 404
 
-        rows_deleted = Student.delete_student(student_id.upper())
-
-        if not rows_deleted:
-            return jsonify({"error": "Student not found"}), 404
-
-        logger.info(f"Student deleted: {student_id.upper()}")
+        logger.info(f"Student deleted: {sid}")
 
         # Clear dashboard cache since stats changed
         clear_dashboard_cache()
@@ -578,6 +806,7 @@ def delete_student(student_id):
         return jsonify({"message": "Student deleted successfully"}), 200
 
     except Exception as e:
+        rollback()
         logger.error(f"Error deleting student: {e}", exc_info=True)
         return jsonify({"error": "Failed to delete student"}), 500
 
@@ -590,10 +819,6 @@ def delete_student(student_id):
 def upload_student_photo(student_id):
     """Upload student photo with proper validation"""
     try:
-        student = Student.get_by_id(student_id.upper())
-        if not student:
-            return jsonify({"error": "Student not found"}), 404
-
         if 'photo' not in request.files:
             return jsonify({"error": "No photo file provided"}), 400
 
@@ -601,41 +826,18 @@ def upload_student_photo(student_id):
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
 
-        # Read file data
-        file_data = file.read()
-
-        # Validate file size (HIGH PRIORITY #2)
-        if len(file_data) > MAX_FILE_SIZE_BYTES:
-            logger.warning(f"File too large: {len(file_data)} bytes")
-            return jsonify({"error": f"File too large. Maximum size is {MAX_FILE_SIZE_MB}MB"}), 400
-
-        # Validate image format using basic file extension check (simplified due to imghdr removal)
-        filename_lower = file.filename.lower()
-        if not any(filename_lower.endswith(ext) for ext in ALLOWED_IMAGE_TYPES):
-            logger.warning(f"Invalid file extension: {file.filename}")
-            return jsonify({"error": f"Invalid image format. Allowed formats: {', '.join(ALLOWED_IMAGE_TYPES).upper()}"}), 400
-
-        logger.info(f"Uploading photo for student: {student_id.upper()}")
-
-        # Upload photo
-        result = Student.upload_profile_photo(
-            student_id=student_id.upper(),
-            file_data=file_data,
-            filename=file.filename
-        )
+        ok, payload = handle_photo_upload(file, student_id.upper(), failure_status=500)
+        if not ok:
+            return payload
 
-        if result['success']:
-            logger.info(f"Photo uploaded successfully: {student_id.upper()}")
-            return jsonify({
-                "message": "Photo uploaded successfully",
-                "photo_url": result['url'],
-                "filename": result['filename']
-            }), 200
-        else:
-            logger.error(f"Photo upload failed: {result.get('error')}")
-            return jsonify({"error": f"Upload failed: {result.get('error', 'Unknown error')}"}), 500
+        return jsonify({
+            "message": "Photo uploaded successfully",
+            "photo_url": payload['url'],
+            "filename": payload['filename']
+        }), 200
 
     except Exception as e:
+        rollback()
         logger.error(f"Error uploading photo: {e}", exc_info=True)
         return jsonify({"error": "Failed to upload photo"}), 500
 
@@ -645,26 +847,24 @@ def upload_student_photo(student_id):
 def delete_student_photo(student_id):
     """Delete student photo"""
     try:
-        student = Student.get_by_id(student_id.upper())
-        if not student:
+        sid = student_id.upper()
+        cleared = Student.clear_profile_photo(sid)
+        if not cleared:
             return jsonify({"error": "Student not found"}), 404
 
-        if not student.get('profile_photo_filename'):
+        filename = cleared.get('profile_photo_filename')
+        if not filename:
             return jsonify({"error": "Student has no profile photo"}), 400
+        commit()
 
-        result = Student.delete_profile_photo(
-            student_id=student_id.upper(),
-            filename=student['profile_photo_filename']
-        )
+        # The record no longer points at the file, so its removal needn't hold up the response
+        Student.queue_photo_removal(sid, filename)
 
-        if result['success']:
-            logger.info(f"Photo deleted: {student_id.upper()}")
-            return jsonify({"message": "Photo deleted successfully"}), 200
-        else:
-            logger.error(f"Photo delete failed: {result.get('error')}")
-            return jsonify({"error": f"Delete failed: {result.get('error', 'Unknown error')}"}), 500
+        logger.info(f"Photo deleted: {sid}")
+        return jsonify({"message": "Photo deleted successfully"}), 200
 
     except Exception as e:
+        rollback()
         logger.error(f"Error deleting photo: {e}", exc_info=True)
         return jsonify({"error": "Failed to delete photo"}), 500
 
@@ -677,25 +877,24 @@ def delete_student_photo(student_id):
 def validate_program_code(program_code):
     """Validate program code"""
     try:
-        valid_programs = get_valid_programs()
-        course_upper = program_code.upper()
+        program = get_valid_programs().get(program_code.upper())
 
-        if course_upper not in valid_programs:
-            program_list = list(valid_programs.keys())
-            return jsonify({
+        # A miss is revalidated every time (ETag only), so a program created
+        # moments ago is recognised immediately
+        if program is None:
+            return conditional_jsonify({
                 "valid": False,
                 "message": f"Program '{program_code}' not found",
-                "available_programs": program_list
-            }), 200
+                "available_programs": get_valid_program_code_list()
+            })
 
-        program = valid_programs[course_upper]
-        return jsonify({
+        return conditional_jsonify({
             "valid": True,
             "program": {
                 "code": program["code"],
                 "name": program["name"]
             }
-        }), 200
+        }, max_age=SLOW_CHANGING_MAX_AGE)
 
     except Exception as e:
         logger.error(f"Error validating program: {e}", exc_info=True)
@@ -707,14 +906,13 @@ def validate_program_code(program_code):
 def get_student_stats():
     """Get student statistics"""
     try:
-        stats = Student.get_student_stats()
-        total_students = Student.count_students()
+        stats = get_cached_student_stats()
 
-        return jsonify({
-            "total_students": total_students,
+        return conditional_jsonify({
+            "total_students": stats.get("total", 0),
             "by_year": stats.get("by_year", []),
             "by_course": stats.get("by_course", []),
-        }), 200
+        }, max_age=SLOW_CHANGING_MAX_AGE)
 
     except Exception as e:
         logger.error(f"Error getting stats: {e}", exc_info=True)
@@ -726,10 +924,10 @@ def get_student_stats():
 def get_filter_options():
     """Get filter options for frontend (genders, years, programs)"""
     try:
-        # Get distinct values from student data
-        students = Student.get_all_students()
-        genders = sorted(set(s.get('gender').title() for s in students if s.get('gender'))) if students else []
-        years = sorted(set(s.get('year') for s in students if s.get('year') is not None)) if students else []
+        # Distinct values come from the database; only the pairs cross the wire
+        pairs = Student.get_filter_values()
+        genders = sorted(set(p['gender'].title() for p in pairs if p.get('gender')))
+        years = sorted(set(p['year'] for p in pairs if p.get('year') is not None))
 
         # Get all valid programs from program table
         valid_programs = get_valid_programs()
@@ -746,6 +944,106 @@ def get_filter_options():
         return jsonify({"error": "Failed to fetch filter options"}), 500
 
 
+@student_bp.route("/export", methods=["GET"])
+@require_auth
+def export_students():
+    """Export students as CSV, streamed row by row (accepts the list filters)"""
+    valid_programs = get_valid_programs()
+    where_clause, params = build_list_filters(
+        valid_programs,
+        request.args.get("search", "", type=str),
+        request.args.get("filter", "all", type=str),
+        request.args.get("course", "", type=str),
+        request.args.get("year", type=int),
+        request.args.get("gender", "", type=str)
+    )
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush():
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return chunk
+
+        # Send ~64KB chunks rather than one tiny write per row
+        writer.writerow(STUDENT_COLUMNS)
+        for student in Student.iter_all(where_clause, params):
+            writer.writerow([student[column] for column in STUDENT_COLUMNS])
+            if buffer.tell() >= 65536:
+                yield flush()
+        yield flush()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=students.csv"}
+    )
+
+
+@student_bp.route("/import", methods=["POST"])
+@require_auth
+def import_students():
+    """Import students from an uploaded CSV (the export's columns); existing IDs are skipped"""
+    try:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({"error": "A CSV file is required"}), 400
+
+        reader = csv.DictReader(io.StringIO(upload.stream.read().decode('utf-8-sig')))
+        valid_programs = get_valid_programs()
+
+        # Validate every row first, then write them all in one bulk insert
+        rows = []
+        row_errors = []
+        for line_number, data in enumerate(reader, start=2):
+            data = {key: (value or '').strip() for key, value in data.items() if key}
+            errors = validate_student_data(data, check_exists=False)
+            if errors:
+                row_errors.append({"row": line_number, "errors": errors})
+                continue
+
+            course_upper = data['course'].upper()
+            actual_program = valid_programs.get(course_upper)
+            rows.append({
+                'id': data['id'].upper(),
+                'firstname': data['firstname'],
+                'lastname': data['lastname'],
+                'course': actual_program['code'] if actual_program else course_upper,
+                'year': int(data['year']),
+                'gender': data['gender'].capitalize()
+            })
+
+        if row_errors:
+            return jsonify({"error": "Import rejected", "rows": row_errors}), 400
+        if not rows:
+            return jsonify({"error": "The CSV file has no student rows"}), 400
+
+        created = Student.bulk_create(rows)
+        commit()
+        skipped = len(rows) - len(created)
+        logger.info(f"Imported {len(created)} students ({skipped} skipped)")
+
+        if created:
+            clear_dashboard_cache()
+
+        return jsonify({
+            "message": f"Imported {len(created)} students",
+            "created": len(created),
+            "skipped": skipped,
+            "ids": created
+        }), 201 if created else 200
+
+    except UnicodeDecodeError:
+        return jsonify({"error": "The CSV file must be UTF-8 encoded"}), 400
+    except Exception as e:
+        rollback()
+        logger.error(f"Error importing students: {e}", exc_info=True)
+        return jsonify({"error": "Failed to import students"}), 500
+
+
 # ============================================
 # DEBUG ENDPOINTS (GATED
 # ============================================
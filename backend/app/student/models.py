@@ -1,18 +1,180 @@
-from ..database import get_one, get_all, insert_record, update_record, delete_record, execute_raw_sql, count_records
+from ..database import savepoint, get_all, insert_record, insert_many, iter_query, update_record, delete_record, execute_raw_sql, count_records
 from ..supabase import supabase_manager
 from ..program.models import Program
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2 import sql
+from functools import lru_cache
 import logging
 import os
+import time
 import uuid
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Background workers for Storage calls the response doesn't depend on
+# (removing replaced or orphaned photos)
+PHOTO_CLEANUP_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="photo-cleanup")
+# Uploads that run while the request writes the student row
+PHOTO_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="photo-upload")
+
+PHOTO_BUCKET = 'student-photos'
+_PHOTO_BUCKET_CLIENT = None
+_PHOTO_BUCKET_PID = None
+_PHOTO_URL_PREFIX = None
+
+
+def photo_bucket():
+    """Storage client for the photo bucket, built once per process and reused
+    (it shares the service-role client's pooled HTTP session)"""
+    global _PHOTO_BUCKET_CLIENT, _PHOTO_BUCKET_PID
+    if _PHOTO_BUCKET_CLIENT is None or _PHOTO_BUCKET_PID != os.getpid():
+        _PHOTO_BUCKET_CLIENT = supabase_manager.get_service_role_client().storage.from_(PHOTO_BUCKET)
+        _PHOTO_BUCKET_PID = os.getpid()
+    return _PHOTO_BUCKET_CLIENT
+
+
+def photo_url_prefix():
+    """Public URL prefix of the photo bucket, resolved once per process"""
+    global _PHOTO_URL_PREFIX
+    if _PHOTO_URL_PREFIX is None:
+        _PHOTO_URL_PREFIX = photo_bucket().get_public_url('placeholder').rsplit('/', 1)[0] + '/'
+    return _PHOTO_URL_PREFIX
+
+
+# Columns exposed through the student API (created_at stays internal)
+STUDENT_COLUMNS = (
+    'id', 'firstname', 'lastname', 'course', 'year', 'gender',
+    'profile_photo_url', 'profile_photo_filename', 'profile_photo_updated_at'
+)
+STUDENT_SELECT = ", ".join(STUDENT_COLUMNS)
+# The same columns qualified for UPDATE ... FROM, where a joined subquery shares names
+STUDENT_RETURNING = ", ".join(f"s.{column}" for column in STUDENT_COLUMNS)
+
+# Primary-key lookups run on every detail, update and validation request,
+# so their SQL is built once rather than per call
+STUDENT_BY_ID_QUERY = f"SELECT {STUDENT_SELECT} FROM student WHERE id = %s"
+STUDENT_EXISTS_QUERY = "SELECT 1 FROM student WHERE id = %s"
+
+# B-tree indexes backing the list filters, sorts and stats grouping.
+# Sort columns carry the id tiebreaker, matching the list ORDER BY and the
+# keyset (column, id) seek, so sorted pages are read straight off the index
+STUDENT_INDEXES = {
+    'idx_student_course': '(course)',
+    'idx_student_year_id': '(year, id)',
+    'idx_student_lastname_id': '(lastname, id)',
+    'idx_student_firstname_id': '(firstname, id)',
+    'idx_student_created_at': '(created_at)',
+    'idx_student_course_year_id': '(course, year, id)',
+}
+
+# Trigram GIN indexes so ILIKE '%term%' search avoids sequential scans
+STUDENT_TRGM_INDEXES = {
+    'ix_student_id_trgm': 'id',
+    'ix_student_firstname_trgm': 'firstname',
+    'ix_student_lastname_trgm': 'lastname',
+    'ix_student_course_trgm': 'course',
+    'ix_student_fullname_trgm': "(firstname || ' ' || lastname)",
+}
+
+# Columns the list endpoint may ORDER BY
+LIST_SORT_COLUMNS = frozenset({'id', 'firstname', 'lastname', 'course', 'year', 'gender', 'created_at'})
+
+# NOT NULL sort columns, which row-value comparison can seek on directly
+KEYSET_SORT_COLUMNS = frozenset({'id', 'firstname', 'lastname', 'year', 'gender'})
+
+# Normalises ids on write so the Python write paths needn't upper-case them
+UPPER_ID_TRIGGER_SQL = """
+    CREATE OR REPLACE FUNCTION upper_student_id() RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.id := UPPER(NEW.id);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_student_upper_id ON student;
+    CREATE TRIGGER trg_student_upper_id
+        BEFORE INSERT OR UPDATE OF id ON student
+        FOR EACH ROW EXECUTE FUNCTION upper_student_id();
+"""
+
+# The database clock stamps profile_photo_updated_at whenever a new photo file is set
+PHOTO_TIMESTAMP_TRIGGER_SQL = """
+    CREATE OR REPLACE FUNCTION stamp_student_photo_updated_at() RETURNS TRIGGER AS $$
+    BEGIN
+        IF NEW.profile_photo_filename IS NOT NULL THEN
+            IF TG_OP = 'INSERT' THEN
+                NEW.profile_photo_updated_at := now();
+            ELSIF NEW.profile_photo_filename IS DISTINCT FROM OLD.profile_photo_filename THEN
+                NEW.profile_photo_updated_at := now();
+            END IF;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_student_photo_updated_at ON student;
+    CREATE TRIGGER trg_student_photo_updated_at
+        BEFORE INSERT OR UPDATE OF profile_photo_filename ON student
+        FOR EACH ROW EXECUTE FUNCTION stamp_student_photo_updated_at();
+"""
+
+FULLNAME_EXPR = "firstname || ' ' || lastname"
+
+# Columns (or expressions) matched by each ?filter= value of the list search,
+# listed cheapest/most selective first so the OR can stop early
+SEARCH_FIELDS = {
+    'all': ('id', 'lastname', 'firstname', 'course', FULLNAME_EXPR),
+    'id': ('id',),
+    'firstname': ('firstname',),
+    'lastname': ('lastname',),
+    'name': (FULLNAME_EXPR,),
+    'fullname': (FULLNAME_EXPR,),
+    'course': ('course',),
+}
+
+
+@lru_cache(maxsize=256)
+def build_list_query(columns, where_clause, order_by, order_direction, has_limit, has_offset, with_total=False):
+    """
+    Build the student list SQL for one query shape
+    The shape is small and repeats constantly, so each query is composed once;
+    column names go through sql.Identifier, so only whitelisted words reach the SQL.
+    with_total adds a total_count column (all matching rows, before LIMIT/OFFSET)
+    """
+    selected = sql.SQL(", ").join(sql.Identifier(column.strip()) for column in columns.split(","))
+    if with_total:
+        selected += sql.SQL(", COUNT(*) OVER () AS total_count")
+    query = sql.SQL("SELECT {columns} FROM student").format(columns=selected)
+    if where_clause:
+        query += sql.SQL(" WHERE ") + sql.SQL(where_clause)
+
+    # NULL courses sort as empty strings; id keeps pages stable
+    direction = sql.SQL(order_direction)
+    query += sql.SQL(" ORDER BY {column} {direction}").format(column=sql.Identifier(order_by), direction=direction)
+    if order_by == 'course':
+        query += sql.SQL(" NULLS FIRST" if order_direction == 'ASC' else " NULLS LAST")
+    if order_by != 'id':
+        query += sql.SQL(", id {direction}").format(direction=direction)
+
+    if has_limit:
+        query += sql.SQL(" LIMIT %s")
+    if has_offset:
+        query += sql.SQL(" OFFSET %s")
+    return query
+
+
+def escape_like(term):
+    """Escape LIKE wildcards so user input is matched literally"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 
 class Student:
     """Student model with Supabase operations"""
 
+    __slots__ = ('id', 'firstname', 'lastname', 'course', 'year', 'gender',
+                 'profile_photo_url', 'profile_photo_filename')
+
     @staticmethod
     def create_table(): 
         """Create student table"""
@@ -33,15 +195,37 @@ class Student:
             )
         """
         execute_raw_sql(create_table_query, commit=True)
+
+        for index_name, index_definition in STUDENT_INDEXES.items():
+            execute_raw_sql(f"CREATE INDEX IF NOT EXISTS {index_name} ON student {index_definition}", commit=True)
+        execute_raw_sql(UPPER_ID_TRIGGER_SQL, commit=True)
+        execute_raw_sql(PHOTO_TIMESTAMP_TRIGGER_SQL, commit=True)
+
+        # pg_trgm may need extra privileges; search still works (unindexed) without it
+        try:
+            execute_raw_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm", commit=True)
+            for index_name, expression in STUDENT_TRGM_INDEXES.items():
+                execute_raw_sql(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON student USING gin ({expression} gin_trgm_ops)",
+                    commit=True
+                )
+        except Exception as e:
+            logger.warning(f"Could not create trigram search indexes: {e}")
         logger.info("Student table created/verified")
 
     @staticmethod
     def get_by_id(student_id):
         """Get student by ID"""
-        return get_one("student", where_clause="id = %s", params=[student_id])
+        result = execute_raw_sql(STUDENT_BY_ID_QUERY, params=[student_id], fetch=True)
+        return result[0] if result else None
 
     @staticmethod
-    def get_all_students(limit=None, offset=None, course_filter=None, year_filter=None):
+    def exists(student_id):
+        """Check whether a student ID is taken without fetching the row"""
+        return bool(execute_raw_sql(STUDENT_EXISTS_QUERY, params=[student_id], fetch=True))
+
+    @staticmethod
+    def get_all_students(limit=None, offset=None, course_filter=None, year_filter=None, columns=STUDENT_SELECT):
         """Get all students with optional filters (LEGACY - for backward compatibility)"""
         where_conditions = []
         params = []
@@ -55,46 +239,89 @@ class Student:
             params.append(year_filter)
 
         where_clause = " AND ".join(where_conditions) if where_conditions else None
-        return get_all("student", where_clause=where_clause, params=params, limit=limit, offset=offset)
+        return get_all("student", columns=columns, where_clause=where_clause, params=params, limit=limit, offset=offset)
+
+    @staticmethod
+    def build_keyset_clause(order_by, order_direction, after_value, after_id):
+        """
+        Build the seek condition for keyset pagination (rows after a cursor)
+        Only valid for KEYSET_SORT_COLUMNS, whose values are never NULL
+        """
+        if order_by not in KEYSET_SORT_COLUMNS:
+            raise ValueError(f"Keyset pagination is not supported for sort '{order_by}'")
+        comparison = '<' if order_direction.upper() == 'DESC' else '>'
+        if order_by == 'id':
+            return f"id {comparison} %s", [after_id]
+        return f"({order_by}, id) {comparison} (%s, %s)", [after_value, after_id]
 
     @staticmethod
-    def get_all_students_filtered(where_clause=None, params=None, order_by="id", order_direction="ASC", limit=None, offset=None):
+    def build_filter_clause(search=None, filter_field="all", course=None, year=None, gender=None):
+        """
+        Build a parameterized WHERE clause for the student list filters
+        Returns (where_clause, params); where_clause is None when nothing is filtered
+        """
+        conditions = []
+        params = []
+
+        if course:
+            conditions.append("course = %s")
+            params.append(course)
+
+        if year is not None:
+            conditions.append("year = %s")
+            params.append(year)
+
+        if gender:
+            conditions.append("LOWER(gender) = %s")
+            params.append(gender.lower())
+
+        search_columns = SEARCH_FIELDS.get(filter_field)
+        if search and search_columns:
+            if ' ' not in search and FULLNAME_EXPR in search_columns:
+                # A term without a space cannot straddle the joining space, so
+                # matching the parts separately is equivalent and skips the concat
+                search_columns = tuple(dict.fromkeys(
+                    part for column in search_columns
+                    for part in (('firstname', 'lastname') if column == FULLNAME_EXPR else (column,))
+                ))
+            pattern = f"%{escape_like(search)}%"
+            conditions.append("(" + " OR ".join(f"{column} ILIKE %s" for column in search_columns) + ")")
+            params.extend([pattern] * len(search_columns))
+
+        where_clause = " AND ".join(conditions) if conditions else None
+        return where_clause, params
+
+    @staticmethod
+    def get_all_students_filtered(where_clause=None, params=None, order_by="id", order_direction="ASC", limit=None, offset=None, columns=STUDENT_SELECT, with_total=False):
         """
         Get filtered students with sorting
-        Uses raw SQL for filtering, ordering, and pagination
+        Uses raw SQL for filtering, ordering, and pagination; with_total, each row
+        also carries total_count so the page and its count share one round-trip
         """
         try:
             # Validate order_by to prevent SQL injection
-            valid_columns = ['id', 'firstname', 'lastname', 'course', 'year', 'gender', 'created_at']
-            if order_by not in valid_columns:
+            if order_by not in LIST_SORT_COLUMNS:
                 logger.warning(f"Invalid order_by column: {order_by}, defaulting to 'id'")
                 order_by = 'id'
 
             # Validate order direction
-            if order_direction.upper() not in ['ASC', 'DESC']:
+            order_direction = order_direction.upper()
+            if order_direction not in ('ASC', 'DESC'):
                 logger.warning(f"Invalid order direction: {order_direction}, defaulting to 'ASC'")
                 order_direction = 'ASC'
 
-            logger.debug(f"Fetching students: where={where_clause}, order={order_by} {order_direction}, limit={limit}, offset={offset}")
-
-            # Build SQL query
-            query = "SELECT * FROM student"
-            query_params = []
+            logger.debug("Fetching students: where=%s, order=%s %s, limit=%s, offset=%s",
+                         where_clause, order_by, order_direction, limit, offset)
 
-            # Apply where clause
-            if where_clause and params:
-                query += f" WHERE {where_clause}"
-                query_params.extend(params)
+            # Build SQL query (cached per query shape)
+            if not (where_clause and params):
+                where_clause = None
+            query = build_list_query(columns, where_clause, order_by, order_direction, bool(limit), bool(offset), with_total)
 
-            # Apply ordering
-            query += f" ORDER BY {order_by} {order_direction}"
-
-            # Apply pagination
+            query_params = list(params) if where_clause else []
             if limit:
-                query += " LIMIT %s"
                 query_params.append(limit)
             if offset:
-                query += " OFFSET %s"
                 query_params.append(offset)
 
             # Execute query
@@ -102,12 +329,64 @@ class Student:
 
             logger.debug(f"Query returned {len(result) if result else 0} students")
 
-            return result if result else []
+            return Student.attach_photo_urls(result) if result else []
 
         except Exception as e:
             logger.error(f"Error fetching filtered students: {e}", exc_info=True)
-            # Fallback to legacy method
-            return Student.get_all_students(limit=limit, offset=offset)
+            raise
+
+    @staticmethod
+    def iter_all(where_clause=None, params=None, chunk=1000):
+        """Stream students (ordered by ID) through a server-side cursor, for exports"""
+        query = f"SELECT {STUDENT_SELECT} FROM student"
+        if where_clause:
+            query += f" WHERE {where_clause}"
+        query += " ORDER BY id"
+        return iter_query(query, params, chunk_size=chunk)
+
+    @staticmethod
+    def get_all_students_keyset(where_clause=None, params=None, order_by="id", order_direction="ASC", limit=10, cursor=None, columns=STUDENT_SELECT):
+        """
+        Get one page of students after a cursor (keyset / seek pagination)
+        Returns (rows, next_cursor); next_cursor is None on the last page
+        """
+        params = list(params or [])
+        if cursor:
+            seek_clause, seek_params = Student.build_keyset_clause(
+                order_by, order_direction, cursor.get('after_value'), cursor['after_id']
+            )
+            where_clause = f"{where_clause} AND {seek_clause}" if where_clause else seek_clause
+            params += seek_params
+
+        # Every row must carry the id and sort value the next cursor is built from
+        selected = [column.strip() for column in columns.split(",")]
+        selected += [column for column in dict.fromkeys(('id', order_by)) if column not in selected]
+
+        rows = Student.get_all_students_filtered(
+            where_clause=where_clause,
+            params=params,
+            order_by=order_by,
+            order_direction=order_direction,
+            limit=limit + 1,
+            columns=", ".join(selected)
+        )
+
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = {'after_id': last['id'], 'after_value': last[order_by]}
+        return page, next_cursor
+
+    @staticmethod
+    def attach_photo_urls(rows):
+        """Fill in profile_photo_url from the stored filename where it is missing (in place)"""
+        prefix = None
+        for row in rows:
+            if row.get('profile_photo_filename') and 'profile_photo_url' in row and not row['profile_photo_url']:
+                prefix = prefix or photo_url_prefix()
+                row['profile_photo_url'] = prefix + row['profile_photo_filename']
+        return rows
 
     @staticmethod
     def count_students(course_filter=None, year_filter=None):
@@ -130,19 +409,12 @@ class Student:
     def count_students_filtered(where_clause=None, params=None):
         """Count students matching filter"""
         try:
-            # Build SQL query for counting
-            query = "SELECT COUNT(*) as count FROM student"
-            query_params = []
-
-            # Apply where clause
-            if where_clause and params:
-                query += f" WHERE {where_clause}"
-                query_params.extend(params)
-
-            # Execute query
-            result = execute_raw_sql(query, params=query_params, fetch=True)
-
-            return result[0]['count'] if result else 0
+            # Bare COUNT(*): no projection or ORDER BY, so the planner can count
+            # from the narrowest index that satisfies the filter
+            with savepoint():
+                if not (where_clause and params):
+                    return count_records("student")
+                return count_records("student", where_clause=where_clause, params=params)
 
         except Exception as e:
             logger.error(f"Error counting filtered students: {e}", exc_info=True)
@@ -150,20 +422,46 @@ class Student:
 
     @staticmethod
     def create_student(student_id, firstname, lastname, course, year, gender, profile_photo_url=None, profile_photo_filename=None):
-        """Create new student"""
+        """
+        Create new student
+        Returns None when the ID is already taken: the primary key decides
+        atomically, so concurrent creates cannot both pass a prior lookup
+        """
         try:
-            profile_photo_updated_at = datetime.utcnow().isoformat() if profile_photo_url else None
-            query = "INSERT INTO student (id, firstname, lastname, course, year, gender, profile_photo_url, profile_photo_filename, profile_photo_updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *"
-            result = execute_raw_sql(query, params=[student_id.upper(), firstname, lastname, course, year, gender, profile_photo_url, profile_photo_filename, profile_photo_updated_at], fetch=True)
+            # profile_photo_updated_at is stamped by trg_student_photo_updated_at
+            query = f"INSERT INTO student (id, firstname, lastname, course, year, gender, profile_photo_url, profile_photo_filename) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (id) DO NOTHING RETURNING {STUDENT_SELECT}"
+            result = execute_raw_sql(query, params=[student_id, firstname, lastname, course, year, gender, profile_photo_url, profile_photo_filename], fetch=True)
+            if not result:
+                logger.warning(f"Duplicate student ID: {student_id}")
+                return None
             logger.info(f"Student created: {student_id}")
-            return result[0] if result else None
+            return result[0]
         except Exception as e:
             logger.error(f"Error creating student: {e}", exc_info=True)
             raise
 
+    @staticmethod
+    def bulk_create(rows):
+        """
+        Create many students in one statement per 500 rows
+        Rows whose ID already exists are skipped; returns the IDs actually inserted
+        """
+        columns = ('id', 'firstname', 'lastname', 'course', 'year', 'gender')
+        values = [tuple(row[column] for column in columns) for row in rows]
+        inserted = insert_many(
+            "student", columns, values,
+            returning="id", on_conflict="(id) DO NOTHING", commit=False
+        )
+        logger.info(f"Bulk created {len(inserted)} of {len(values)} students")
+        return [row['id'] for row in inserted]
+
     @staticmethod
     def update_student(student_id, firstname=None, lastname=None, course=None, year=None, gender=None, new_id=None, profile_photo_url=None, profile_photo_filename=None):
-        """Update student information"""
+        """
+        Update student information and return the updated row (None if not found)
+        When a photo filename is set, the row also carries previous_photo_filename:
+        the file it replaced, read in the same statement
+        """
         try:
             update_data = {}
             if firstname:
@@ -177,12 +475,11 @@ class Student:
             if gender:
                 update_data['gender'] = gender
             if new_id:
-                update_data['id'] = new_id.upper()
+                update_data['id'] = new_id
             if profile_photo_url is not None:
                 update_data['profile_photo_url'] = profile_photo_url
             if profile_photo_filename is not None:
                 update_data['profile_photo_filename'] = profile_photo_filename
-                update_data['profile_photo_updated_at'] = datetime.utcnow().isoformat()
 
             if not update_data:
                 logger.warning(f"No data to update for student: {student_id}")
@@ -190,14 +487,32 @@ class Student:
 
             logger.debug(f"Updating student {student_id}: {update_data}")
 
-            result = update_record(
-                "student",
-                update_data,
-                "id = %s",
-                params=[student_id]
-            )
+            # Left uncommitted: the route commits once any photo upload has landed,
+            # or rolls back if it failed
+            if profile_photo_filename is not None:
+                # As in swap_profile_photo, the locked subquery yields the filename
+                # being replaced, so a concurrent photo change can't be missed
+                set_clause = ", ".join(f"{column} = %s" for column in update_data)
+                query = f"""
+                    UPDATE student AS s
+                    SET {set_clause}
+                    FROM (SELECT id, profile_photo_filename FROM student WHERE id = %s FOR UPDATE) AS old
+                    WHERE s.id = old.id
+                    RETURNING {STUDENT_RETURNING}, old.profile_photo_filename AS previous_photo_filename
+                """
+                rows = execute_raw_sql(query, params=[*update_data.values(), student_id], fetch=True)
+                result = rows[0] if rows else None
+            else:
+                result = update_record(
+                    "student",
+                    update_data,
+                    "id = %s",
+                    params=[student_id],
+                    commit=False,
+                    returning=STUDENT_SELECT
+                )
 
-            logger.info(f"Student updated: {student_id}" + (f" (new ID: {new_id.upper()})" if new_id else ""))
+            logger.info(f"Student updated: {student_id}" + (f" (new ID: {result['id']})" if new_id and result else ""))
             return result
         except Exception as e:
             logger.error(f"Error updating student: {e}", exc_info=True)
@@ -205,159 +520,204 @@ class Student:
 
     @staticmethod
     def delete_student(student_id):
-        """Delete student with photo cleanup (HIGH PRIORITY - proper order)"""
+        """
+        Delete student and clean up their photo
+        Returns the deleted row's photo info, or None when no student matched
+        """
         try:
-            # Get student first
-            student = Student.get_by_id(student_id)
-            if not student:
+            # One conditional DELETE both checks existence and hands back the photo
+            deleted = delete_record("student", "id = %s", params=[student_id], returning="profile_photo_filename")
+            if not deleted:
                 logger.warning(f"Student not found for deletion: {student_id}")
-                return 0
-
-            # Delete photo FIRST (less critical if fails)
-            if student.get('profile_photo_filename'):
-                try:
-                    Student.delete_profile_photo(student_id, student['profile_photo_filename'])
-                    logger.info(f"Photo deleted for student: {student_id}")
-                except Exception as e:
-                    logger.warning(f"Could not delete photo for {student_id}: {e}")
-
-            # Then delete student record
-            result = delete_record("student", "id = %s", params=[student_id])
+                return None
             logger.info(f"Student deleted: {student_id}")
-            return result
+
+            # Photo cleanup is less critical, so don't hold the response on Storage
+            Student.queue_photo_removal(student_id, deleted.get('profile_photo_filename'))
+
+            return deleted
 
         except Exception as e:
             logger.error(f"Error deleting student: {e}", exc_info=True)
             raise
 
     @staticmethod
-    def get_students_by_course(course):
+    def get_students_by_course(course, columns=STUDENT_SELECT):
         """Get students by course"""
-        return get_all("student", where_clause="course = %s", params=[course])
+        return get_all("student", columns=columns, where_clause="course = %s", params=[course])
 
     @staticmethod
-    def get_students_by_year(year):
+    def get_year_distribution(course):
+        """Count a course's students per year, aggregated in SQL"""
+        query = "SELECT year, COUNT(*) AS count FROM student WHERE course = %s GROUP BY year ORDER BY year"
+        return execute_raw_sql(query, params=[course], fetch=True) or []
+
+    @staticmethod
+    def get_filter_values():
+        """Distinct (gender, year) pairs, for building filter dropdowns without reading whole rows"""
+        query = "SELECT DISTINCT gender, year FROM student"
+        return execute_raw_sql(query, fetch=True) or []
+
+    @staticmethod
+    def get_students_by_year(year, columns=STUDENT_SELECT):
         """Get students by year"""
-        return get_all("student", where_clause="year = %s", params=[year])
+        return get_all("student", columns=columns, where_clause="year = %s", params=[year])
 
     @staticmethod
     def upload_profile_photo(student_id, file_data, filename):
-        """Upload profile photo to Supabase Storage - FIXED: Delete old photo before uploading new one"""
+        """
+        Upload profile photo to Supabase Storage and point the student's record at it
+        (one UPDATE, left for the caller to commit); the result names the replaced
+        file, which the caller removes once the new record is committed
+        """
         try:
-            # Generate unique filename for new photo
-            file_extension = os.path.splitext(filename)[1].lower()
-            unique_filename = f"{student_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}{file_extension}"
-
-            logger.debug(f"Uploading photo: {unique_filename}")
-
-            # Check if student already has a photo that needs to be deleted
-            existing_student = Student.get_by_id(student_id)
-            old_filename = None
-            if existing_student and existing_student.get('profile_photo_filename'):
-                old_filename = existing_student['profile_photo_filename']
-                logger.debug(f"Found existing photo to delete: {old_filename}")
-
-            # Upload new photo to Supabase Storage
-            bucket = supabase_manager.get_service_role_client().storage.from_('student-photos')
-            response = bucket.upload(unique_filename, file_data, {
-                'content-type': f'image/{file_extension[1:]}'
-            })
-
-            if response:
-                # Get public URL for new photo
-                public_url = bucket.get_public_url(unique_filename)
-
-                # Only delete old photo after new one is successfully uploaded
-                if old_filename:
-                    try:
-                        logger.debug(f"Deleting old photo: {old_filename}")
-                        bucket.remove([old_filename])
-                        logger.info(f"Old photo deleted: {old_filename}")
-                    except Exception as e:
-                        logger.warning(f"Could not delete old photo {old_filename}: {e}")
-                        # Don't fail the entire operation if old photo deletion fails
-
-                # Update student record with new photo info
-                update_record(
-                    "student",
-                    {
-                        'profile_photo_url': public_url,
-                        'profile_photo_filename': unique_filename,
-                        'profile_photo_updated_at': datetime.utcnow().isoformat()
-                    },
-                    "id = %s",
-                    params=[student_id]
-                )
+            unique_filename = Student.new_photo_filename(student_id, filename)
+            public_url = Student.store_photo_file(unique_filename, file_data)
 
-                logger.info(f"Photo uploaded and old photo cleaned up: {unique_filename}")
+            # Point the record at the new photo, learning the old one in the same statement
+            previous = Student.swap_profile_photo(student_id, public_url, unique_filename)
+            if previous is None:
+                Student.queue_photo_removal(student_id, unique_filename)
+                return {'success': False, 'error': 'Student not found', 'not_found': True}
 
-                return {
-                    'success': True,
-                    'url': public_url,
-                    'filename': unique_filename
-                }
-            else:
-                logger.error("Photo upload failed - no response")
-                return {'success': False, 'error': 'Upload failed'}
+            return {
+                'success': True,
+                'url': public_url,
+                'filename': unique_filename,
+                'previous_filename': previous.get('profile_photo_filename')
+            }
 
         except Exception as e:
             logger.error(f"Error uploading photo: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
     @staticmethod
-    def delete_profile_photo(student_id, filename):
-        """Delete profile photo from Supabase Storage"""
-        try:
-            logger.debug(f"Deleting photo: {filename}")
+    def start_photo_upload(student_id, file_data, filename):
+        """
+        Begin uploading a photo in the background
+        Returns (future, url, unique_filename); the URL is known up front, so the
+        caller can write the student row while the upload is in flight
+        """
+        unique_filename = Student.new_photo_filename(student_id, filename)
+        future = PHOTO_UPLOAD_EXECUTOR.submit(Student.store_photo_file, unique_filename, file_data)
+        return future, photo_url_prefix() + unique_filename, unique_filename
 
-            bucket = supabase_manager.get_service_role_client().storage.from_('student-photos')
-            response = bucket.remove([filename])
+    @staticmethod
+    def discard_photo_upload(future, student_id, filename):
+        """Remove a started upload's file once it lands (the row that needed it was never written)"""
+        future.add_done_callback(
+            lambda done: done.exception() is None and Student.queue_photo_removal(student_id, filename)
+        )
 
-            if response:
-                # Update student record to clear photo info
-                update_record(
-                    "student",
-                    {
-                        'profile_photo_url': None,
-                        'profile_photo_filename': None
-                    },
-                    "id = %s",
-                    params=[student_id]
-                )
+    @staticmethod
+    def new_photo_filename(student_id, filename):
+        """Unique storage name for a student's photo, keeping the file's extension"""
+        file_extension = os.path.splitext(filename)[1].lower()
+        return f"{student_id}_{time.strftime('%Y%m%d_%H%M%S', time.gmtime())}{file_extension}"
 
-                logger.info(f"Photo deleted: {filename}")
-                return {'success': True}
-            else:
-                logger.error("Photo deletion failed - no response")
-                return {'success': False, 'error': 'Delete failed'}
+    @staticmethod
+    def store_photo_file(unique_filename, file_data):
+        """Upload a photo file to Supabase Storage; returns its public URL"""
+        logger.debug(f"Uploading photo: {unique_filename}")
 
-        except Exception as e:
-            logger.error(f"Error deleting photo: {e}", exc_info=True)
-            return {'success': False, 'error': str(e)}
+        response = photo_bucket().upload(unique_filename, file_data, {
+            'content-type': f'image/{os.path.splitext(unique_filename)[1][1:]}'
+        })
+        if not response:
+            raise RuntimeError("Upload failed")
+
+        logger.info(f"Photo uploaded: {unique_filename}")
+        # Public URLs share the bucket prefix, so no per-file storage call
+        return photo_url_prefix() + unique_filename
 
     @staticmethod
-    def get_student_stats():
-        """Get student statistics"""
+    def swap_profile_photo(student_id, url, filename):
+        """
+        Replace a student's photo columns in one statement
+        Returns the row with the previous profile_photo_filename, or None when no student matched
+        """
+        # RETURNING only sees new values, so read the old filename through a locked subquery;
+        # the photo trigger stamps profile_photo_updated_at when a new file is set
+        query = """
+            UPDATE student AS s
+            SET profile_photo_url = %s,
+                profile_photo_filename = %s
+            FROM (SELECT id, profile_photo_filename FROM student WHERE id = %s FOR UPDATE) AS old
+            WHERE s.id = old.id
+            RETURNING old.profile_photo_filename
+        """
+        result = execute_raw_sql(query, params=[url, filename, student_id], fetch=True)
+        return result[0] if result else None
+
+    @staticmethod
+    def clear_profile_photo(student_id):
+        """Clear a student's photo columns; returns the previous filename row, or None when no student matched"""
+        return Student.swap_profile_photo(student_id, None, None)
+
+    @staticmethod
+    def queue_photo_removal(student_id, filename):
+        """Remove a replaced or orphaned photo in the background (nothing waits on it)"""
+        if filename:
+            logger.debug(f"Queueing photo deletion: {filename}")
+            PHOTO_CLEANUP_EXECUTOR.submit(Student._remove_photo_quietly, student_id, filename)
+
+    @staticmethod
+    def _remove_photo_quietly(student_id, filename):
+        """Remove a deleted student's photo; an orphaned file is only logged"""
         try:
-            # Get stats by year
-            year_query = "SELECT year, COUNT(*) as count FROM student GROUP BY year ORDER BY year"
-            year_result = execute_raw_sql(year_query, fetch=True)
+            Student.remove_photo_file(filename)
+            logger.info(f"Photo deleted for student: {student_id}")
+        except Exception as e:
+            logger.warning(f"Could not delete photo for {student_id}: {e}")
 
-            # Get stats by course
-            course_query = "SELECT course, COUNT(*) as count FROM student WHERE course IS NOT NULL GROUP BY course ORDER BY count DESC"
-            course_result = execute_raw_sql(course_query, fetch=True)
+    @staticmethod
+    def remove_photo_file(filename):
+        """Delete a profile photo from Supabase Storage"""
+        logger.debug(f"Deleting photo: {filename}")
 
-            return {
-                'by_year': [{'year': s['year'], 'count': s['count']} for s in year_result or []],
-                'by_course': [{'course': s['course'], 'count': s['count']} for s in course_result or []]
-            }
+        response = photo_bucket().remove([filename])
+        if not response:
+            raise RuntimeError("Delete failed")
+
+        logger.info(f"Photo deleted: {filename}")
+
+    @staticmethod
+    def get_student_stats():
+        """Get student statistics (total, by year, by course) in a single scan"""
+        try:
+            # GROUPING() tells the by-year, by-course and grand-total rows apart
+            # (course itself may be NULL, so NULL checks alone are ambiguous).
+            # Rows come back with years ascending, then courses by count, so the
+            # lists below are filled already in display order
+            query = """
+                SELECT year, course, COUNT(*) AS count,
+                       GROUPING(year) AS year_grouped, GROUPING(course) AS course_grouped
+                FROM student
+                GROUP BY GROUPING SETS ((year), (course), ())
+                ORDER BY GROUPING(year), year, COUNT(*) DESC
+            """
+            with savepoint():
+                result = execute_raw_sql(query, fetch=True) or []
+
+            total = 0
+            by_year = []
+            by_course = []
+            for row in result:
+                if row['year_grouped'] and row['course_grouped']:
+                    total = row['count']
+                elif not row['year_grouped']:
+                    by_year.append({'year': row['year'], 'count': row['count']})
+                elif row['course'] is not None:
+                    by_course.append({'course': row['course'], 'count': row['count']})
+
+            return {'total': total, 'by_year': by_year, 'by_course': by_course}
         except Exception as e:
             logger.error(f"Error getting stats: {e}", exc_info=True)
-            return {'by_year': [], 'by_course': []}
+            return {'total': 0, 'by_year': [], 'by_course': []}
 
     def __init__(self, student_id, firstname, lastname, course, year, gender, profile_photo_url=None, profile_photo_filename=None):
-        """Initialize Student object"""
-        self.id = student_id.upper()
+        """Initialize Student object (trg_student_upper_id upper-cases the ID on write)"""
+        self.id = student_id
         self.firstname = firstname
         self.lastname = lastname
         self.course = course
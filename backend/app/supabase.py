@@ -1,91 +1,130 @@
+import logging
 import os
 import re
-from supabase import create_client, Client
-from typing import Optional, Dict, List, Any
-import json
+import threading
+from functools import lru_cache
+from supabase import create_client, Client, ClientOptions
+from typing import Optional, Dict, List
 
 # Supabase configuration
 SUPABASE_URL = "https://ufbvyiuydgjydqxayibp.supabase.co"
 SUPABASE_KEY = os.getenv('SUPABASE_ANON_KEY')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "supabase_manager",
+    "get_one", "get_all", "insert_record", "update_record",
+    "delete_record", "count_records", "execute_raw_sql", "paginate_query",
+    "auth_get_user_by_username", "auth_get_user_by_email", "auth_verify_user_credentials",
+]
+
+# Upper bound (seconds) on a single Storage call, so a stalled upload or
+# removal cannot hold a worker or photo executor thread indefinitely
+SUPABASE_STORAGE_TIMEOUT = int(os.getenv('SUPABASE_STORAGE_TIMEOUT', '20'))
+
+def _client_options() -> ClientOptions:
+    """Options for a new client (a fresh instance each time: clients write their auth headers into it)"""
+    return ClientOptions(storage_client_timeout=SUPABASE_STORAGE_TIMEOUT)
+
 class SupabaseManager:
+    """
+    Holds this process's Supabase clients, created on first use
+    Nothing connects at import time, and a forked worker builds its own clients
+    instead of sharing its parent's HTTP sockets
+    """
+
     def __init__(self):
         self.client: Optional[Client] = None
         self.service_role_client: Optional[Client] = None
-        print(f"🔧 [SUPABASE] Initializing SupabaseManager...")
-        print(f"🔧 [SUPABASE] SUPABASE_URL: {SUPABASE_URL}")
-        print(f"🔧 [SUPABASE] SUPABASE_KEY exists: {SUPABASE_KEY is not None}")
-        print(f"🔧 [SUPABASE] SUPABASE_SERVICE_ROLE_KEY exists: {SUPABASE_SERVICE_ROLE_KEY is not None}")
-        self.connect()
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        logger.debug("Initializing SupabaseManager (url=%s, anon key set: %s, service role key set: %s)",
+                     SUPABASE_URL, SUPABASE_KEY is not None, SUPABASE_SERVICE_ROLE_KEY is not None)
+
+    def _check_process(self):
+        """Forget clients inherited across a fork"""
+        pid = os.getpid()
+        if self._pid != pid:
+            self.client = None
+            self.service_role_client = None
+            self._pid = pid
     
     def connect(self):
-        """Initialize Supabase client connection"""
+        """Create this process's Supabase clients (no network round-trip)"""
         try:
             if not SUPABASE_KEY:
                 raise ValueError("SUPABASE_ANON_KEY environment variable must be set")
             
-            print(f"🔌 [SUPABASE] Creating Supabase client...")
-            self.client = create_client(SUPABASE_URL, SUPABASE_KEY)
-            print("✅ [SUPABASE] Supabase client created successfully")
+            logger.debug("Creating Supabase client for process %s", os.getpid())
+            self.client = create_client(SUPABASE_URL, SUPABASE_KEY, options=_client_options())
             
             # Create service role client if key is available
             if SUPABASE_SERVICE_ROLE_KEY:
-                print(f"🔐 [SUPABASE] Creating service role client...")
-                self.service_role_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-                print("✅ [SUPABASE] Service role client created successfully")
+                logger.debug("Creating service role client")
+                self.service_role_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options=_client_options())
             else:
-                print("⚠️  [SUPABASE] No service role key found, using anon key for all operations")
-            
-            # Test the connection
-            print(f"🧪 [SUPABASE] Testing connection...")
-            test_response = self.client.table('users').select('id').limit(1).execute()
-            print(f"✅ [SUPABASE] Connection test successful: {type(test_response)}")
+                logger.warning("No service role key found, using anon key for all operations")
             
         except Exception as e:
-            print(f"❌ [SUPABASE] Failed to connect to Supabase: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to connect to Supabase: %s", e)
             raise
     
     def get_client(self) -> Client:
         """Get Supabase client instance"""
+        self._check_process()
         if not self.client:
-            print(f"⚠️  [SUPABASE] Client is None, reconnecting...")
-            self.connect()
+            with self._lock:
+                if not self.client:
+                    self.connect()
         return self.client
     
     def get_service_role_client(self) -> Optional[Client]:
         """Get Supabase service role client instance (bypasses RLS)"""
+        self._check_process()
         if not self.service_role_client:
-            print(f"⚠️  [SUPABASE] Service role client is None, creating...")
-            if SUPABASE_SERVICE_ROLE_KEY:
-                try:
-                    self.service_role_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-                    print("✅ [SUPABASE] Service role client created successfully")
-                except Exception as e:
-                    print(f"❌ [SUPABASE] Failed to create service role client: {e}")
-                    return None
-            else:
-                print("⚠️  [SUPABASE] No service role key available")
+            if not SUPABASE_SERVICE_ROLE_KEY:
+                logger.warning("No service role key available")
                 return None
+            with self._lock:
+                if not self.service_role_client:
+                    try:
+                        self.service_role_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options=_client_options())
+                        logger.debug("Service role client created")
+                    except Exception as e:
+                        logger.error("Failed to create service role client: %s", e)
+                        return None
         return self.service_role_client
     
     def test_connection(self) -> bool:
         """Test database connection"""
         try:
-            print(f"🧪 [SUPABASE] Testing connection via test_connection method...")
-            response = self.client.table('users').select('count').limit(1).execute()
-            print(f"✅ [SUPABASE] Test connection successful: {response}")
+            logger.debug("Testing Supabase connection")
+            self.get_client().table('users').select('count').limit(1).execute()
+            logger.debug("Supabase connection test successful")
             return True
         except Exception as e:
-            print(f"❌ [SUPABASE] Connection test failed: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Supabase connection test failed: %s", e)
             return False
 
+# Column wrapped in a SQL function, e.g. UPPER(code)
+_FUNC_COLUMN_RE = re.compile(r'[A-Z_]+\(([a-zA-Z_]+)\)')
+
+@lru_cache(maxsize=128)
+def _where_column(where_clause: str) -> Optional[str]:
+    """
+    Column filtered by a "column = %s" where clause (None for any other shape)
+    SQL functions are dropped, so "UPPER(code) = %s" filters on code; callers
+    use a handful of fixed clauses, so each is parsed once
+    """
+    if ' = ' not in where_clause:
+        return None
+    column = where_clause.split(' = ', 1)[0].replace('%s', '').strip()
+    func_match = _FUNC_COLUMN_RE.match(column)
+    return func_match.group(1) if func_match else column
+
 # Global Supabase manager instance
-print(f"🚀 [SUPABASE] Creating global Supabase manager...")
 supabase_manager = SupabaseManager()
 
 def get_one(table: str, columns: str = "*", where_clause: str = None, params: List = None, use_service_role: bool = False) -> Optional[Dict]:
@@ -94,35 +133,24 @@ def get_one(table: str, columns: str = "*", where_clause: str = None, params: Li
         # Choose client based on use_service_role flag
         client = supabase_manager.get_service_role_client() if use_service_role else supabase_manager.get_client()
         if not client:
-            print(f"❌ [SUPABASE] No client available for {table} query")
+            logger.error("No Supabase client available for %s query", table)
             return None
             
         query = client.table(table).select(columns)
         
         if where_clause and params:
-            if ' = ' in where_clause:
-                column, _ = where_clause.split(' = ', 1)
-                # Clean up column name (remove SQL functions like UPPER(), LOWER(), etc.)
-                clean_column = column.replace('%s', '').strip()
-                # Remove SQL functions and get just the column name
-                if '(' in clean_column and ')' in clean_column:
-                    # Extract column name from functions like UPPER(code)
-                    import re
-                    func_match = re.match(r'([A-Z_]+\()([a-zA-Z_]+)', clean_column)
-                    if func_match:
-                        clean_column = func_match.group(2)
-                
+            column_name = _where_column(where_clause)
+            if column_name:
                 # FIXED: Remove case conversion - use exact matching
-                param_value = params[0]
-                
-                query = query.eq(clean_column, param_value)
+                query = query.eq(column_name, params[0])
         
-        result = query.maybe_single().execute()
-        # FIXED: Check if result is not None before accessing result.data
-        return result.data if result else None
+        # A plain LIMIT 1 rather than maybe_single(): no single-object Accept
+        # negotiation, and no error path when nothing matches
+        result = query.limit(1).execute()
+        return result.data[0] if result.data else None
         
     except Exception as e:
-        print(f"Error getting record from {table}: {e}")
+        logger.error("Error getting record from %s: %s", table, e)
         return None
 
 def get_all(table: str, columns: str = "*", where_clause: str = None, params: List = None, 
@@ -132,26 +160,16 @@ def get_all(table: str, columns: str = "*", where_clause: str = None, params: Li
         # Choose client based on use_service_role flag
         client = supabase_manager.get_service_role_client() if use_service_role else supabase_manager.get_client()
         if not client:
-            print(f"❌ [SUPABASE] No client available for {table} query")
+            logger.error("No Supabase client available for %s query", table)
             return []
             
         query = client.table(table).select(columns)
         
         if where_clause and params:
-            if ' = ' in where_clause:
-                column, _ = where_clause.split(' = ', 1)
-                # Clean up column name for SQL functions
-                clean_column = column.replace('%s', '').strip()
-                if '(' in clean_column and ')' in clean_column:
-                    import re
-                    func_match = re.match(r'([A-Z_]+\()([a-zA-Z_]+)', clean_column)
-                    if func_match:
-                        clean_column = func_match.group(2)
-                
+            column_name = _where_column(where_clause)
+            if column_name:
                 # FIXED: Remove case conversion - use exact matching
-                param_value = params[0]
-                
-                query = query.eq(clean_column, param_value)
+                query = query.eq(column_name, params[0])
         
         if order_by:
             query = query.order(order_by)
@@ -164,39 +182,29 @@ def get_all(table: str, columns: str = "*", where_clause: str = None, params: Li
         result = query.execute()
         return result.data or []
     except Exception as e:
-        print(f"Error getting records from {table}: {e}")
+        logger.error("Error getting records from %s: %s", table, e)
         return []
 
 def insert_record(table: str, data: Dict, returning: str = "*", commit: bool = True) -> Optional[Dict]:
     """Insert record and return specified columns - FIXED VERSION"""
     try:
         # Insert the data using service role client to bypass RLS for authenticated users
-        insert_response = supabase_manager.get_service_role_client().table(table).insert(data).execute()
+        query = supabase_manager.get_service_role_client().table(table).insert(data)
+        if returning != "*":
+            # PostgREST applies ?select= to the returned representation, so the
+            # requested columns come back from the INSERT itself
+            query.params = query.params.add("select", returning)
+        insert_response = query.execute()
 
         if not insert_response.data:
-            print(f"No data returned from insert operation")
+            logger.warning("No data returned from insert into %s", table)
             return None
 
-        # Get the inserted record's ID (assuming 'id' is the primary key)
-        inserted_record = insert_response.data[0]
-        print(f"Inserted record: {inserted_record}")
-
-        # If we need to return specific columns, do a follow-up select
-        if returning != "*":
-            # Get the ID field value
-            record_id = inserted_record.get('id')
-            if record_id:
-                print(f"Fetching record with ID {record_id}")
-                select_response = supabase_manager.get_service_role_client().table(table).select(returning).eq('id', record_id).execute()
-                if select_response.data:
-                    return select_response.data[0]
-
-        return inserted_record
+        logger.debug("Inserted record into %s", table)
+        return insert_response.data[0]
 
     except Exception as e:
-        print(f"Error inserting record into {table}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error inserting record into %s: %s", table, e)
         return None
 
 def update_record(table: str, data: Dict, where_clause: str, params: List = None, commit: bool = True) -> Optional[int]:
@@ -211,24 +219,22 @@ def update_record(table: str, data: Dict, where_clause: str, params: List = None
         else:
             update_data = data
         
-        if ' = ' in where_clause:
-            column, _ = where_clause.split(' = ', 1)
-            column_name = column.replace('%s', '').strip()
+        column_name = _where_column(where_clause)
+        if column_name:
             id_value = params[0]
             response = supabase_manager.get_client().table(table).update(update_data).eq(column_name, id_value).execute()
             return len(response.data) if response.data else 0
         
         return 0
     except Exception as e:
-        print(f"Error updating record in {table}: {e}")
+        logger.error("Error updating record in %s: %s", table, e)
         return None
 
 def delete_record(table: str, where_clause: str, params: List = None, commit: bool = True) -> Optional[int]:
     """Delete record(s) from a table"""
     try:
-        if ' = ' in where_clause:
-            column, _ = where_clause.split(' = ', 1)
-            column_name = column.replace('%s', '').strip()
+        column_name = _where_column(where_clause)
+        if column_name:
             id_value = params[0] if params else None
             
             if id_value:
@@ -237,7 +243,7 @@ def delete_record(table: str, where_clause: str, params: List = None, commit: bo
         
         return 0
     except Exception as e:
-        print(f"Error deleting record from {table}: {e}")
+        logger.error("Error deleting record from %s: %s", table, e)
         return None
 
 def count_records(table: str, where_clause: str = None, params: List = None) -> int:
@@ -247,40 +253,49 @@ def count_records(table: str, where_clause: str = None, params: List = None) ->
         query = supabase_manager.get_client().table(table).select('id', count='exact')
 
         if where_clause and params:
-            if ' = ' in where_clause:
-                column, _ = where_clause.split(' = ', 1)
-                # Clean up column name for SQL functions
-                clean_column = column.replace('%s', '').strip()
-                if '(' in clean_column and ')' in clean_column:
-                    import re
-                    func_match = re.match(r'([A-Z_]+\()([a-zA-Z_]+)', clean_column)
-                    if func_match:
-                        clean_column = func_match.group(2)
-
-               
-                param_value = params[0]
-
-                query = query.eq(clean_column, param_value)
+            column_name = _where_column(where_clause)
+            if column_name:
+                # FIXED: Remove case conversion - use exact matching
+                query = query.eq(column_name, params[0])
 
         response = query.execute()
         return response.count if hasattr(response, 'count') and response.count is not None else 0
     except Exception as e:
-        print(f"Error counting records in {table}: {e}")
+        logger.error("Error counting records in %s: %s", table, e)
         return 0
 
 def execute_raw_sql(query: str, params: List = None, fetch: bool = False, commit: bool = False):
     """Execute raw SQL query (for complex queries that Supabase client can't handle)"""
-    print("Raw SQL execution not supported with Supabase client")
-    print("Consider using Supabase RPC functions instead")
+    logger.warning("Raw SQL execution not supported with Supabase client; use an RPC function instead")
     return None
 
+def _paginate_one_shot(table: str, columns: str, where_clause: str, params: List,
+                       order_by: str, limit: int, offset: int, exact_count: bool = True):
+    """Fetch one page and its total in a single PostgREST request; returns (rows, total)"""
+    # 'estimated' counts exactly up to PostgREST's max-rows, then uses the planner's
+    # row estimate (pg_class.reltuples) instead of scanning every match
+    query = supabase_manager.get_client().table(table).select(columns, count='exact' if exact_count else 'estimated')
+
+    if where_clause and params:
+        column_name = _where_column(where_clause)
+        if column_name:
+            query = query.eq(column_name, params[0])
+
+    if order_by:
+        query = query.order(order_by)
+
+    response = query.range(offset, offset + limit - 1).execute()
+    return response.data or [], response.count or 0
+
 def paginate_query(table: str, columns: str = "*", where_clause: str = None, params: List = None, 
-                  page: int = 1, per_page: int = 10, order_by: str = None):
-    """Paginate a query result"""
+                  page: int = 1, per_page: int = 10, order_by: str = None, exact_count: bool = True):
+    """
+    Paginate a query result (rows and total come back in one request)
+    exact_count=False trades an exact total for a planner estimate on large results
+    """
     try:
         offset = (page - 1) * per_page
-        items = get_all(table, columns, where_clause, params, order_by, per_page, offset)
-        total = count_records(table, where_clause, params)
+        items, total = _paginate_one_shot(table, columns, where_clause, params, order_by, per_page, offset, exact_count)
         
         return {
             'items': items,
@@ -290,7 +305,7 @@ def paginate_query(table: str, columns: str = "*", where_clause: str = None, par
             'pages': (total + per_page - 1) // per_page if total > 0 else 0
         }
     except Exception as e:
-        print(f"Error in paginate_query: {e}")
+        logger.error("Error in paginate_query: %s", e)
         return {
             'items': [],
             'total': 0,
@@ -307,17 +322,17 @@ def auth_get_user_by_username(username: str) -> Optional[Dict]:
     Get user by username using service_role client (bypasses RLS)
     This is used for authentication to avoid RLS policy issues
     """
-    print(f"🔐 [AUTH] Service role lookup for username: {username}")
+    logger.debug("Service role lookup for username: %s", username)
     try:
         # Use service role client to bypass RLS
         user = get_one('users', where_clause='username = %s', params=[username], use_service_role=True)
         if user:
-            print(f"✅ [AUTH] Found user: {user.get('username')}")
+            logger.debug("Found user: %s", user.get('username'))
         else:
-            print(f"❌ [AUTH] User not found: {username}")
+            logger.debug("User not found: %s", username)
         return user
     except Exception as e:
-        print(f"❌ [AUTH] Error getting user by username: {e}")
+        logger.error("Error getting user by username: %s", e)
         return None
 
 def auth_get_user_by_email(email: str) -> Optional[Dict]:
@@ -325,17 +340,17 @@ def auth_get_user_by_email(email: str) -> Optional[Dict]:
     Get user by email using service_role client (bypasses RLS)
     This is used for authentication to avoid RLS policy issues
     """
-    print(f"🔐 [AUTH] Service role lookup for email: {email}")
+    logger.debug("Service role lookup for email: %s", email)
     try:
         # Use service role client to bypass RLS
         user = get_one('users', where_clause='email = %s', params=[email], use_service_role=True)
         if user:
-            print(f"✅ [AUTH] Found user: {user.get('username')}")
+            logger.debug("Found user: %s", user.get('username'))
         else:
-            print(f"❌ [AUTH] User not found: {email}")
+            logger.debug("User not found: %s", email)
         return user
     except Exception as e:
-        print(f"❌ [AUTH] Error getting user by email: {e}")
+        logger.error("Error getting user by email: %s", e)
         return None
 
 def auth_verify_user_credentials(username: str, password: str) -> Optional[Dict]:
@@ -346,7 +361,7 @@ def auth_verify_user_credentials(username: str, password: str) -> Optional[Dict]
     2. Verifies password hash
     3. Returns user data if valid, None if invalid
     """
-    print(f"🔐 [AUTH] Verifying credentials for: {username}")
+    logger.debug("Verifying credentials for: %s", username)
     
     try:
         # Import here to avoid circular import
@@ -356,27 +371,26 @@ def auth_verify_user_credentials(username: str, password: str) -> Optional[Dict]
         user = auth_get_user_by_username(username)
         
         if not user:
-            print(f"❌ [AUTH] User not found: {username}")
+            logger.debug("User not found: %s", username)
             return None
         
         # Verify password
         password_hash = user.get('password_hash')
         if not password_hash:
-            print(f"❌ [AUTH] No password hash found for user: {username}")
+            logger.warning("No password hash found for user: %s", username)
             return None
         
         # Check password
         if check_password_hash(password_hash, password):
-            print(f"✅ [AUTH] Password verified for: {username}")
+            logger.debug("Password verified for: %s", username)
             # Return user data without password hash
-            user_data = {k: v for k, v in user.items() if k != 'password_hash'}
-            return user_data
+            # (the row was fetched for this call alone, so strip it in place)
+            user.pop('password_hash', None)
+            return user
         else:
-            print(f"❌ [AUTH] Invalid password for: {username}")
+            logger.debug("Invalid password for: %s", username)
             return None
             
     except Exception as e:
-        print(f"❌ [AUTH] Error verifying credentials: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error verifying credentials: %s", e)
         return None
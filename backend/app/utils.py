@@ -0,0 +1,16 @@
+"""
+Response helpers shared by the API blueprints
+"""
+from flask import request, jsonify
+
+
+def conditional_jsonify(payload, max_age=0):
+    """
+    Serialize a GET response with a weak ETag derived from its body.
+    Returns a bodiless 304 when the client's If-None-Match already matches;
+    max_age lets the browser reuse slowly-changing data without asking at all.
+    """
+    response = jsonify(payload)
+    response.add_etag(weak=True)
+    response.headers["Cache-Control"] = f"private, max-age={max_age}" if max_age else "private, no-cache"
+    return response.make_conditional(request)
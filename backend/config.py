@@ -31,7 +31,8 @@ class Config:
     SESSION_COOKIE_SAMESITE = 'Lax'
     
     # File Upload Configuration
-    MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB max file size
+    MAX_PHOTO_SIZE_MB = 5
+    MAX_CONTENT_LENGTH = MAX_PHOTO_SIZE_MB * 1024 * 1024 + 64 * 1024  # Max photo size plus headroom for multipart form fields
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp'}
     
     # Logging Configuration
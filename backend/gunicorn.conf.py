@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration for production.
+
+Uses cooperative gevent workers so a worker waiting on PostgreSQL or
+Supabase can keep serving other requests instead of blocking on I/O.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+
+def post_fork(server, worker):
+    """Make psycopg2 yield to the gevent hub while waiting on the database"""
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        server.log.info("psycopg2 patched for gevent in worker %s", worker.pid)
@@ -0,0 +1,44 @@
+"""Add B-tree indexes for student filters and sorts
+
+Revision ID: add_student_filter_indexes
+Revises: add_student_trgm_indexes
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_student_filter_indexes'
+down_revision = 'add_student_trgm_indexes'
+branch_labels = None
+depends_on = None
+
+
+# Index name -> columns, matching Student.create_table. Sort columns carry the
+# id tiebreaker, matching the list ORDER BY and the keyset (column, id) seek
+STUDENT_INDEXES = {
+    'idx_student_course': 'course',
+    'idx_student_year_id': 'year, id',
+    'idx_student_lastname_id': 'lastname, id',
+    'idx_student_firstname_id': 'firstname, id',
+    'idx_student_created_at': 'created_at',
+    'idx_student_course_year_id': 'course, year, id',
+}
+
+
+def upgrade():
+    for index_name, columns in STUDENT_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON student ({columns})")
+    # supabase_schema.sql used to create a plain (year) index, which
+    # idx_student_year_id now covers
+    op.execute("DROP INDEX IF EXISTS idx_student_year")
+
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS idx_student_year ON student (year)")
+    # idx_student_course predates this revision in supabase_schema.sql,
+    # so only drop the ones introduced here
+    for index_name in STUDENT_INDEXES:
+        if index_name != 'idx_student_course':
+            op.execute(f"DROP INDEX IF EXISTS {index_name}")
@@ -0,0 +1,27 @@
+"""Add a trigram index on the student full name expression
+
+Revision ID: add_student_fullname_trgm_index
+Revises: add_student_upper_id_trigger
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_student_fullname_trgm_index'
+down_revision = 'add_student_upper_id_trigger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Must match the search expression text exactly for the planner to use it
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_student_fullname_trgm "
+        "ON student USING gin ((firstname || ' ' || lastname) gin_trgm_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_student_fullname_trgm")
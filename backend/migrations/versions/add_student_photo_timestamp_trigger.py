@@ -0,0 +1,44 @@
+"""Stamp profile_photo_updated_at with a trigger
+
+Revision ID: add_student_photo_timestamp_trigger
+Revises: add_student_fullname_trgm_index
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_student_photo_timestamp_trigger'
+down_revision = 'add_student_fullname_trgm_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only a newly set file moves the timestamp; clearing the photo leaves it as is
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stamp_student_photo_updated_at() RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.profile_photo_filename IS NOT NULL THEN
+                IF TG_OP = 'INSERT' THEN
+                    NEW.profile_photo_updated_at := now();
+                ELSIF NEW.profile_photo_filename IS DISTINCT FROM OLD.profile_photo_filename THEN
+                    NEW.profile_photo_updated_at := now();
+                END IF;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_student_photo_updated_at ON student")
+    op.execute("""
+        CREATE TRIGGER trg_student_photo_updated_at
+            BEFORE INSERT OR UPDATE OF profile_photo_filename ON student
+            FOR EACH ROW EXECUTE FUNCTION stamp_student_photo_updated_at()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_student_photo_updated_at ON student")
+    op.execute("DROP FUNCTION IF EXISTS stamp_student_photo_updated_at()")
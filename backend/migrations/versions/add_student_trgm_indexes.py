@@ -0,0 +1,37 @@
+"""Add pg_trgm GIN indexes for student search
+
+Revision ID: add_student_trgm_indexes
+Revises: change_cascade_to_set_null
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_student_trgm_indexes'
+down_revision = 'change_cascade_to_set_null'
+branch_labels = None
+depends_on = None
+
+
+# Columns matched with ILIKE '%term%' by the student search
+TRGM_COLUMNS = ['id', 'firstname', 'lastname', 'course']
+
+
+def upgrade():
+    # Leading-wildcard ILIKE cannot use a B-tree, so index the trigrams instead
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for column in TRGM_COLUMNS:
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_student_{column}_trgm "
+            f"ON student USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    for column in TRGM_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_student_{column}_trgm")
+
+    # Leave the pg_trgm extension installed; other objects may depend on it
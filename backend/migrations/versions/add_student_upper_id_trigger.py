@@ -0,0 +1,38 @@
+"""Upper-case student IDs with a trigger
+
+Revision ID: add_student_upper_id_trigger
+Revises: add_student_filter_indexes
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_student_upper_id_trigger'
+down_revision = 'add_student_filter_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # BEFORE rows see the incoming id, so CHECK (id = UPPER(id)) always passes
+    op.execute("""
+        CREATE OR REPLACE FUNCTION upper_student_id() RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.id := UPPER(NEW.id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_student_upper_id ON student")
+    op.execute("""
+        CREATE TRIGGER trg_student_upper_id
+            BEFORE INSERT OR UPDATE OF id ON student
+            FOR EACH ROW EXECUTE FUNCTION upper_student_id()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_student_upper_id ON student")
+    op.execute("DROP FUNCTION IF EXISTS upper_student_id()")
@@ -47,12 +47,25 @@ CREATE TABLE IF NOT EXISTS users (
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_program_college ON program(college);
 CREATE INDEX IF NOT EXISTS idx_student_course ON student(course);
-CREATE INDEX IF NOT EXISTS idx_student_year ON student(year);
+-- Sort columns carry the id tiebreaker used by the list ORDER BY and keyset seeks
+CREATE INDEX IF NOT EXISTS idx_student_year_id ON student(year, id);
+CREATE INDEX IF NOT EXISTS idx_student_lastname_id ON student(lastname, id);
+CREATE INDEX IF NOT EXISTS idx_student_firstname_id ON student(firstname, id);
+CREATE INDEX IF NOT EXISTS idx_student_created_at ON student(created_at);
+CREATE INDEX IF NOT EXISTS idx_student_course_year_id ON student(course, year, id);
 CREATE INDEX IF NOT EXISTS idx_student_photo ON student(profile_photo_url);
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_college_code ON college(code);
 
+-- Trigram indexes so ILIKE '%term%' student search avoids a sequential scan
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_student_id_trgm ON student USING gin (id gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_student_firstname_trgm ON student USING gin (firstname gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_student_lastname_trgm ON student USING gin (lastname gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_student_course_trgm ON student USING gin (course gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_student_fullname_trgm ON student USING gin ((firstname || ' ' || lastname) gin_trgm_ops);
+
 -- Insert sample data for testing
 -- Colleges
 INSERT INTO college (code, name) VALUES 
@@ -154,6 +167,38 @@ FROM student s
 LEFT JOIN program p ON s.course = p.code
 LEFT JOIN college c ON p.college = c.code;
 
+-- Upper-case student IDs on write (the CHECK constraint then always holds)
+CREATE OR REPLACE FUNCTION upper_student_id() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.id := UPPER(NEW.id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_student_upper_id ON student;
+CREATE TRIGGER trg_student_upper_id
+    BEFORE INSERT OR UPDATE OF id ON student
+    FOR EACH ROW EXECUTE FUNCTION upper_student_id();
+
+-- Stamp profile_photo_updated_at from the database clock when a new photo file is set
+CREATE OR REPLACE FUNCTION stamp_student_photo_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.profile_photo_filename IS NOT NULL THEN
+        IF TG_OP = 'INSERT' THEN
+            NEW.profile_photo_updated_at := now();
+        ELSIF NEW.profile_photo_filename IS DISTINCT FROM OLD.profile_photo_filename THEN
+            NEW.profile_photo_updated_at := now();
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_student_photo_updated_at ON student;
+CREATE TRIGGER trg_student_photo_updated_at
+    BEFORE INSERT OR UPDATE OF profile_photo_filename ON student
+    FOR EACH ROW EXECUTE FUNCTION stamp_student_photo_updated_at();
+
 -- Functions for common operations
 CREATE OR REPLACE FUNCTION get_student_stats()
 RETURNS TABLE(year_count INTEGER, student_count BIGINT) AS $$